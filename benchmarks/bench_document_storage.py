@@ -0,0 +1,101 @@
+"""On-disk size and retrieval latency: duplicated plain text vs the compressed chunk store.
+
+"duplicate" mirrors the old layout: full text in documents.content and again as the
+Chroma document. "chunked" stores compressed chunk frames once in SQLite and only a
+snippet in Chroma, decompressing the matched chunks at query time. Random embeddings
+are used so no model is needed.
+
+    python benchmarks/bench_document_storage.py --documents 200 --doc-kb 50
+"""
+import argparse, os, random, sqlite3, statistics, sys, tempfile, time
+import chromadb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot.logic.chunk_store import ChunkStore  # noqa: E402
+
+DIM = 384
+CHUNK_SIZE, CHUNK_OVERLAP = 1000, 100
+WORDS = ("contract invoice payment schedule delivery clause party agreement section "
+         "liability termination notice period amount total tax report quarter").split()
+
+
+def make_text(kb):
+    words, size = [], 0
+    while size < kb * 1024:
+        word = random.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def chunk(text):
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+    return [text[i:i + CHUNK_SIZE] for i in range(0, max(len(text) - CHUNK_OVERLAP, 1), step)]
+
+
+def vectors(n):
+    return [[random.random() for _ in range(DIM)] for _ in range(n)]
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def build(layout, path, texts):
+    conn = sqlite3.connect(os.path.join(path, "chatbot_memory.db"))
+    conn.execute("CREATE TABLE documents (id INTEGER PRIMARY KEY, filename TEXT, content TEXT, embedding_id TEXT)")
+    store = ChunkStore(conn) if layout == "chunked" else None
+    collection = chromadb.PersistentClient(path=os.path.join(path, "chroma")).create_collection("document_qna")
+
+    for n, text in enumerate(texts):
+        doc_id, chunks = f"doc_{n}", chunk(text)
+        conn.execute("INSERT INTO documents (filename, content, embedding_id) VALUES (?, ?, ?)",
+                     (f"{n}.txt", None if store else text, doc_id))
+        if store:
+            store.put(doc_id, chunks)
+        conn.commit()
+        collection.add(
+            ids=[f"{doc_id}_{i}" for i in range(len(chunks))],
+            embeddings=vectors(len(chunks)),
+            documents=[ChunkStore.snippet(c) for c in chunks] if store else chunks,
+            metadatas=[{"embedding_id": doc_id, "chunk": i} for i in range(len(chunks))]
+        )
+    return conn, store, collection
+
+
+def retrieve(store, collection, queries):
+    latencies = []
+    for _ in range(queries):
+        started = time.perf_counter()
+        results = collection.query(query_embeddings=vectors(1), n_results=4, include=["metadatas", "documents"])
+        if store:
+            store.get((m["embedding_id"], m["chunk"]) for m in results["metadatas"][0])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--doc-kb", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = [make_text(args.doc_kb) for _ in range(args.documents)]
+    codec = ChunkStore(sqlite3.connect(":memory:")).codec
+    print(f"{args.documents} documents x {args.doc_kb} KB, codec: {codec}")
+    print(f"{'layout':>10} {'sqlite MB':>10} {'chroma MB':>10} {'total MB':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for layout in ("duplicate", "chunked"):
+        with tempfile.TemporaryDirectory() as path:
+            conn, store, collection = build(layout, path, texts)
+            p50, p95 = retrieve(store, collection, args.queries)
+            conn.close()
+            sqlite_mb = os.path.getsize(os.path.join(path, "chatbot_memory.db")) / 1e6
+            chroma_mb = dir_size(os.path.join(path, "chroma")) / 1e6
+            print(f"{layout:>10} {sqlite_mb:>10.1f} {chroma_mb:>10.1f} {sqlite_mb + chroma_mb:>9.1f} "
+                  f"{p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
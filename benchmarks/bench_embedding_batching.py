@@ -0,0 +1,59 @@
+"""Query-embedding throughput under concurrency: direct FastEmbed calls vs the micro-batcher.
+
+    python benchmarks/bench_embedding_batching.py --clients 10 50 100 --seconds 10
+"""
+import argparse, os, sys, threading, time
+from langchain_community.embeddings import FastEmbedEmbeddings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot.logic.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+QUERIES = ["what does the contract say about termination", "when is the invoice due",
+           "summarise the quarterly report", "who signed the agreement", "list the delivery dates"]
+
+
+def run(embedder, clients, seconds):
+    latencies, lock = [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(i):
+        n = i
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            embedder.embed_query(f"{QUERIES[n % len(QUERIES)]} {n}")
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+            n += clients
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    model = FastEmbedEmbeddings()
+    model.embed_query("warm up")
+    print(f"{'clients':>7} {'mode':>8} {'q/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'fill':>6}")
+    for clients in args.clients:
+        qps, p50, p99 = run(model, clients, args.seconds)
+        print(f"{clients:>7} {'direct':>8} {qps:>8.1f} {p50:>8.1f} {p99:>8.1f} {'-':>6}")
+        batcher = EmbeddingBatcher(model, max_batch=args.batch_size, max_wait_ms=args.max_wait_ms)
+        qps, p50, p99 = run(batcher, clients, args.seconds)
+        print(f"{clients:>7} {'batched':>8} {qps:>8.1f} {p50:>8.1f} {p99:>8.1f} {batcher.stats()['fill_ratio']:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
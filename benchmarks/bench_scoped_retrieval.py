@@ -0,0 +1,64 @@
+"""Per-user document search latency as the global corpus grows.
+
+Compares the shared document_qna collection with an owner `where` filter against
+a dedicated per-owner collection, using random embeddings so no model is needed.
+
+    python benchmarks/bench_scoped_retrieval.py --owners 10 100 500 --chunks-per-owner 200
+"""
+import argparse, random, statistics, tempfile, time
+import chromadb
+
+DIM = 384  # FastEmbed's default bge-small model
+
+
+def random_vectors(n):
+    return [[random.random() for _ in range(DIM)] for _ in range(n)]
+
+
+def populate(collection, owners, chunks_per_owner, batch=1000):
+    ids, embeddings, metadatas = [], [], []
+    for o in range(owners):
+        for c in range(chunks_per_owner):
+            ids.append(f"doc_{o}_{c}")
+            metadatas.append({"owner": f"user:{o}", "workspace": "", "chunk": c})
+    for start in range(0, len(ids), batch):
+        end = start + batch
+        collection.add(ids=ids[start:end], embeddings=random_vectors(len(ids[start:end])),
+                       metadatas=metadatas[start:end])
+
+
+def time_queries(collection, where, queries):
+    latencies = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        collection.query(query_embeddings=random_vectors(1), n_results=4, where=where)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--owners", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--chunks-per-owner", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'owners':>8} {'corpus':>9} {'shared p50':>11} {'shared p95':>11} {'part. p50':>10} {'part. p95':>10}")
+    for owners in args.owners:
+        with tempfile.TemporaryDirectory() as path:
+            client = chromadb.PersistentClient(path=path)
+            shared = client.create_collection("document_qna")
+            populate(shared, owners, args.chunks_per_owner)
+            dedicated = client.create_collection("document_qna_user0")
+            populate(dedicated, 1, args.chunks_per_owner)
+
+            where = {"owner": "user:0"}
+            shared_p50, shared_p95 = time_queries(shared, where, args.queries)
+            part_p50, part_p95 = time_queries(dedicated, where, args.queries)
+            print(f"{owners:>8} {owners * args.chunks_per_owner:>9,} {shared_p50:>9.2f}ms {shared_p95:>9.2f}ms "
+                  f"{part_p50:>8.2f}ms {part_p95:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Time-to-first-token against the stub Ollama: cold vs warm models, and old vs new prompt layout.
+
+"cold vs warm" idles longer than keep_alive between requests, once on its own and once
+with the ModelWarmer pinging in the background. "layout" replays interleaved
+conversations from several users through the stub's prefix cache, rendering each turn
+the old way (instructions inside every human message) and with chatbot.logic.prompts.
+
+    python benchmarks/bench_ttft.py --load-ms 3000 --idle 4 --users 4 --turns 6
+"""
+import argparse, json, os, random, statistics, sys, threading, time
+from http.server import ThreadingHTTPServer
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot.logic.model_warmer import ModelWarmer  # noqa: E402
+from chatbot.logic.prompts import SYSTEM_PROMPT, human_message  # noqa: E402
+from stub_ollama import StubConfig, make_handler  # noqa: E402
+
+MODEL = "llama3.2:3b"
+HISTORY_TURNS = 5
+LEGACY_SYSTEM = "You are Thara Chat, a helpful AI assistant. Provide concise, friendly responses."
+WORDS = ("contract invoice payment schedule delivery clause party agreement section "
+         "liability termination notice period amount total tax report quarter").split()
+
+
+def legacy_human(question, context):
+    return (
+        f"Please provide a helpful, friendly response to the following question.\n"
+        f"Be conversational but informative, and use markdown formatting when helpful.\n\n"
+        f"Context:\n{context}\n\n"
+        f"Question: {question}\n\n"
+        f"Response:"
+    )
+
+
+def render(system, history, human):
+    """Flatten messages the way ChatPromptTemplate does for a completion model"""
+    lines = [f"System: {system}"]
+    for question, answer in history:
+        lines += [f"Human: {question}", f"AI: {answer}"]
+    lines.append(f"Human: {human}")
+    return "\n".join(lines)
+
+
+def start_stub(config):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def ttft(session, base_url, prompt, keep_alive):
+    """Seconds until the first non-empty token arrives, and the full answer"""
+    started, first, answer = time.perf_counter(), None, []
+    with session.post(f"{base_url}/api/generate", stream=True, timeout=300,
+                      json={"model": MODEL, "prompt": prompt, "keep_alive": keep_alive}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            token = json.loads(line).get("response", "")
+            if token and first is None:
+                first = time.perf_counter() - started
+            answer.append(token)
+    return first, "".join(answer)
+
+
+def cold_vs_warm(args, config):
+    server, base_url = start_stub(config)
+    session = requests.Session()
+    keep_alive = f"{args.keep_alive}s"
+    prompt = render(SYSTEM_PROMPT, [], human_message("When is the invoice due?"))
+    results = {}
+    for mode in ("no warmer", "warmer"):
+        warmer = None
+        if mode == "warmer":
+            warmer = ModelWarmer([MODEL], base_url, keep_alive=keep_alive,
+                                 interval_seconds=max(args.keep_alive / 2, 0.5),
+                                 business_hours=(0, 24), weekdays=range(7))
+            warmer.start()
+        samples = []
+        for _ in range(args.repeats):
+            time.sleep(args.idle)
+            samples.append(ttft(session, base_url, prompt, keep_alive)[0] * 1000)
+        if warmer:
+            warmer.stop()
+        # Let the model unload so the next mode starts from the same state
+        time.sleep(args.keep_alive + 0.5)
+        results[mode] = samples
+    server.shutdown()
+    return results
+
+
+def conversations(users, turns, context_chars):
+    """Interleaved (user, question, context) turns, round-robin across users"""
+    rng = random.Random(7)
+    for turn in range(turns):
+        for user in range(users):
+            context = " ".join(rng.choice(WORDS) for _ in range(context_chars // 8))[:context_chars]
+            yield user, f"user {user} question {turn}: what does the {rng.choice(WORDS)} say?", context
+
+
+def layout(args, config_factory):
+    results = {}
+    for name in ("legacy", "stable prefix"):
+        config = config_factory()
+        server, base_url = start_stub(config)
+        session = requests.Session()
+        ModelWarmer([MODEL], base_url, keep_alive="10m").ping(MODEL)
+        histories, samples, prompt_chars, missed = {}, [], 0, 0
+        for user, question, context in conversations(args.users, args.turns, args.context_chars):
+            history = histories.setdefault(user, [])[-HISTORY_TURNS:]
+            if name == "legacy":
+                prompt = render(LEGACY_SYSTEM, history, legacy_human(question, context))
+            else:
+                prompt = render(SYSTEM_PROMPT, history, human_message(question, context))
+            # Look at the cache before the request, which is what the stub charges prefill against
+            with config.state_lock:
+                cached = list(config.cached_prompts.get(MODEL, []))
+            shared = max((len(os.path.commonprefix([prompt, p])) for p in cached), default=0)
+            prompt_chars += len(prompt)
+            missed += len(prompt) - shared
+            first, answer = ttft(session, base_url, prompt, "10m")
+            samples.append(first * 1000)
+            histories[user].append((question, answer.strip()))
+        server.shutdown()
+        results[name] = (samples, 1 - missed / prompt_chars)
+    return results
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-ms", type=float, default=3000, help="Stub model load time")
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=40, help="Stub prompt processing cost")
+    parser.add_argument("--keep-alive", type=float, default=2, help="Seconds a model stays loaded (scaled down)")
+    parser.add_argument("--idle", type=float, default=4, help="Idle gap before each cold/warm request")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--context-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    def config_factory():
+        return StubConfig(token_ms=2, tokens=20, prefill_ms_per_kchar=args.prefill_ms_per_kchar,
+                          parallel=4, load_ms=args.load_ms, keep_alive_seconds=args.keep_alive)
+
+    print(f"{'scenario':>14} {'p50 ms':>9} {'p95 ms':>9} {'prefix reuse':>13}")
+    for mode, samples in cold_vs_warm(args, config_factory()).items():
+        p50, p95 = summary(samples)
+        print(f"{mode:>14} {p50:>9.1f} {p95:>9.1f} {'-':>13}")
+    for name, (samples, reuse) in layout(args, config_factory).items():
+        p50, p95 = summary(samples)
+        print(f"{name:>14} {p50:>9.1f} {p95:>9.1f} {reuse:>13.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Memory per added worker and throughput scaling for the multi-worker deployment.
+
+Starts gunicorn with gunicorn.conf.py for each worker count, records the proportional
+set size (PSS, so copy-on-write pages are split fairly) of the master and workers,
+then drives canned chat turns at the chat/ endpoint. Canned replies keep Ollama out
+of the measurement. Run the Chroma server and the embedding service first.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --seconds 20 --clients 32
+"""
+import argparse, os, re, signal, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = ["hi", "who are you", "what can you do", "thanks", "2 + 2 * 3"]
+
+
+def pss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return int(re.search(r"^Pss:\s+(\d+) kB", f.read(), re.M).group(1))
+    except (OSError, AttributeError):
+        return 0
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_until_up(url, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(1)
+    return False
+
+
+def drive(url, seconds, clients):
+    def client(i):
+        session = requests.Session()
+        session.get(url)
+        headers = {"X-CSRFToken": session.cookies.get("csrftoken", ""),
+                   "X-Requested-With": "XMLHttpRequest", "Referer": url}
+        done = errors = 0
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            try:
+                r = session.post(f"{url}chat/", data={"question": QUESTIONS[done % len(QUESTIONS)]},
+                                 headers=headers, timeout=30)
+                done += 1
+                errors += r.status_code != 200
+            except requests.RequestException:
+                errors += 1
+        return done, errors
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    return sum(r[0] for r in results) / seconds, sum(r[1] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--bind", default="127.0.0.1:8011")
+    args = parser.parse_args()
+    url = f"http://{args.bind}/"
+
+    print(f"{'workers':>7} {'master MB':>10} {'MB/worker':>10} {'total MB':>9} {'req/s':>8} {'errors':>7}")
+    for workers in args.workers:
+        env = dict(os.environ, CHATBOT_WORKERS=str(workers), CHATBOT_BIND=args.bind)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "chatbot_project.wsgi"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_until_up(url):
+                print(f"{workers:>7} server did not start")
+                continue
+            throughput, errors = drive(url, args.seconds, args.clients)
+            master = pss_kb(server.pid) / 1024
+            worker_mb = [pss_kb(p) / 1024 for p in children(server.pid)]
+            per_worker = sum(worker_mb) / max(len(worker_mb), 1)
+            print(f"{workers:>7} {master:>10.1f} {per_worker:>10.1f} {master + sum(worker_mb):>9.1f} "
+                  f"{throughput:>8.1f} {errors:>7}")
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
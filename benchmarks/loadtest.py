@@ -0,0 +1,253 @@
+"""Concurrent load generator for chat/ and api/upload/.
+
+Replays a weighted mix of traffic at a fixed concurrency (closed loop) or arrival
+rate (open loop, Poisson), and reports throughput, latency percentiles, error rates
+and the per-stage breakdown the views publish in their Server-Timing header.
+With --ramp it steps the load up until p99 or the error rate breaks the SLO, or
+throughput stops keeping pace with the added load, and reports the last level that held.
+
+Start the stub LLM and point the app at it first:
+
+    python benchmarks/stub_ollama.py --token-ms 20 --tokens 80 &
+    OLLAMA_HOST=http://127.0.0.1:11434 python manage.py runserver --noreload
+    python benchmarks/loadtest.py --mix greeting=4,math=2,llm=3,upload=1 --ramp 4:4:64
+"""
+import argparse, random, statistics, threading, time, uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+WORDS = "alpha beta gamma delta report invoice policy summary meeting budget schedule".split()
+QUERIES = {
+    "greeting": ["hi", "hello", "hey", "who are you", "what can you do", "thanks"],
+    "math": ["2 + 2", "12 * 7 - 3", "(5 + 3) / 4", "2 ^ 10", "100 / 7"],
+    "llm": ["What is the capital of France?", "Give me a tip for writing emails",
+            "Explain why the sky is blue", "Summarise the benefits of exercise"],
+}
+# A level has plateaued when throughput grew by less than this share of the load increase
+PLATEAU_FRACTION = 0.5
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in QUERIES and name != "upload":
+            raise argparse.ArgumentTypeError(f"Unknown traffic type: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_size(text):
+    units = {"k": 1024, "m": 1024 * 1024}
+    text = text.lower()
+    return int(float(text[:-1]) * units[text[-1]]) if text[-1] in units else int(text)
+
+
+def make_document(size):
+    words, total = [], 0
+    while total < size:
+        word = random.choice(WORDS)
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words).encode()
+
+
+def make_question(kind):
+    """LLM questions get a unique suffix so the repeated-question cache never answers them"""
+    question = random.choice(QUERIES[kind])
+    if kind == "llm":
+        question += f" (regarding {' '.join(random.sample(WORDS, 3))} {uuid.uuid4().hex[:8]})"
+    return question
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)]
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.stages = defaultdict(list)
+
+    def add(self, kind, seconds, ok, server_timing):
+        with self.lock:
+            self.latencies[kind].append(seconds * 1000)
+            if not ok:
+                self.errors[kind] += 1
+            for entry in filter(None, (e.strip() for e in server_timing.split(","))):
+                name, _, dur = entry.partition(";dur=")
+                if dur:
+                    self.stages[f"{kind}.{name}"].append(float(dur))
+
+    def summary(self, elapsed):
+        every = sorted(v for values in self.latencies.values() for v in values)
+        requests_made = len(every)
+        errors = sum(self.errors.values())
+        return {
+            "requests": requests_made,
+            "throughput": requests_made / elapsed if elapsed else 0.0,
+            "error_rate": errors / requests_made if requests_made else 0.0,
+            "p50": percentile(every, 50),
+            "p95": percentile(every, 95),
+            "p99": percentile(every, 99),
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url, mix, upload_sizes):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.documents = [make_document(size) for size in upload_sizes]
+        self._local = threading.local()
+
+    def _session(self):
+        # One session per client thread, carrying its CSRF cookie like a browser tab would
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            session.get(self.base_url, timeout=30)
+            session.headers.update({
+                "X-CSRFToken": session.cookies.get("csrftoken", ""),
+                "X-Requested-With": "XMLHttpRequest",
+                "Referer": self.base_url,
+            })
+            self._local.session = session
+        return self._local.session
+
+    def one_request(self, results):
+        kind = random.choices(self.kinds, self.weights)[0]
+        session = self._session()
+        started = time.perf_counter()
+        try:
+            if kind == "upload":
+                body = random.choice(self.documents)
+                files = {"document": (f"load-{uuid.uuid4().hex}.txt", body, "text/plain")}
+                response = session.post(f"{self.base_url}api/upload/", files=files, timeout=300)
+            else:
+                response = session.post(f"{self.base_url}chat/", data={"question": make_question(kind)},
+                                        timeout=300)
+            ok = response.status_code == 200
+            timing = response.headers.get("Server-Timing", "")
+        except requests.RequestException:
+            ok, timing = False, ""
+        results.add(kind, time.perf_counter() - started, ok, timing)
+
+    def run_closed(self, concurrency, seconds):
+        """Each of `concurrency` clients sends its next request as soon as the last one returns"""
+        results = Results()
+        deadline = time.perf_counter() + seconds
+
+        def client():
+            while time.perf_counter() < deadline:
+                self.one_request(results)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(client)
+        return results, time.perf_counter() - started
+
+    def run_open(self, rate, seconds, max_in_flight=1000):
+        """Requests arrive as a Poisson process regardless of how fast the server responds"""
+        results = Results()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            next_at = started
+            while next_at < started + seconds:
+                time.sleep(max(next_at - time.perf_counter(), 0))
+                pool.submit(self.one_request, results)
+                next_at += random.expovariate(rate)
+        return results, time.perf_counter() - started
+
+
+def plateaued(throughput, best_throughput, load, best_load):
+    """Throughput that stops tracking the added load means requests are only queueing"""
+    load_growth = load / best_load - 1
+    if not best_throughput or load_growth <= 0:
+        return False
+    return throughput < best_throughput * (1 + PLATEAU_FRACTION * load_growth)
+
+
+def print_row(level, summary):
+    print(f"{level:>8} {summary['requests']:>8} {summary['throughput']:>8.1f} {summary['p50']:>9.0f} "
+          f"{summary['p95']:>9.0f} {summary['p99']:>9.0f} {summary['error_rate'] * 100:>6.1f}%")
+
+
+def print_breakdown(results):
+    print("\nPer-type latency (ms) and error counts:")
+    for kind, values in sorted(results.latencies.items()):
+        values = sorted(values)
+        print(f"  {kind:<10} n={len(values):<6} p50={percentile(values, 50):>7.0f} "
+              f"p99={percentile(values, 99):>7.0f} errors={results.errors[kind]}")
+    if results.stages:
+        print("\nServer-side stages (ms, mean / p95):")
+        for stage, values in sorted(results.stages.items()):
+            values = sorted(values)
+            print(f"  {stage:<20} {statistics.mean(values):>8.1f} / {percentile(values, 95):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("greeting=4,math=2,llm=3,upload=1"))
+    parser.add_argument("--upload-sizes", type=lambda s: [parse_size(x) for x in s.split(",")],
+                        default=[parse_size("10k"), parse_size("200k")])
+    parser.add_argument("--seconds", type=float, default=30, help="Duration of each load level")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients")
+    parser.add_argument("--rate", type=float, help="Open-loop arrivals per second instead of --concurrency")
+    parser.add_argument("--ramp", help="start:step:max over concurrency (or rate with --rate)")
+    parser.add_argument("--slo-p99-ms", type=float, default=5000)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    test = LoadTest(args.url, args.mix, args.upload_sizes)
+    open_loop = args.rate is not None
+    if args.ramp:
+        start, step, stop = (float(x) for x in args.ramp.split(":"))
+        levels = []
+        while start <= stop:
+            levels.append(start)
+            start += step
+    else:
+        levels = [args.rate if open_loop else args.concurrency]
+
+    print(f"{'rate' if open_loop else 'clients':>8} {'requests':>8} {'req/s':>8} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    saturated_at, last_good, best_throughput = None, None, 0.0
+    for level in levels:
+        # Closed-loop clients are whole numbers; compare the load actually applied
+        load = level if open_loop else int(level)
+        if open_loop:
+            results, elapsed = test.run_open(level, args.seconds)
+        else:
+            results, elapsed = test.run_closed(load, args.seconds)
+        summary = results.summary(elapsed)
+        print_row(f"{level:g}", summary)
+
+        broke_slo = summary["p99"] > args.slo_p99_ms or summary["error_rate"] > args.max_error_rate
+        flat = last_good is not None and plateaued(
+            summary["throughput"], best_throughput, load, last_good[3]
+        )
+        if args.ramp and (broke_slo or flat):
+            saturated_at = level
+            break
+        best_throughput = max(best_throughput, summary["throughput"])
+        last_good = (level, summary, results, load)
+
+    if last_good:
+        print_breakdown(last_good[2])
+    if args.ramp:
+        if saturated_at is None:
+            print(f"\nNo saturation up to {levels[-1]:g}; extend --ramp.")
+        else:
+            print(f"\nSaturated at {saturated_at:g}; highest sustainable level {last_good[0] if last_good else 0:g} "
+                  f"at {best_throughput:.1f} req/s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Local stand-in for the Ollama HTTP API with tunable latency.
+
+Streams canned tokens from /api/generate and /api/chat so load tests exercise the
+whole request path without a GPU. Point the app at it with OLLAMA_HOST.
+
+It also models the two effects that dominate time-to-first-token: loading a model
+that has been unloaded (keep_alive expired), and the prompt-prefix cache, where only
+the part of a prompt not shared with a recent prompt has to be prefilled.
+
+    python benchmarks/stub_ollama.py --port 11434 --token-ms 20 --tokens 80 --parallel 2
+"""
+import argparse, json, os, random, re, threading, time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the document explains how the system works and what you can do next "
+         "with a few friendly steps to get started quickly").split()
+
+
+def parse_keep_alive(value, default):
+    """Ollama accepts durations like "30m"/"10s", plain seconds, or negative for forever"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float("inf") if value < 0 else float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+    if not match:
+        return default
+    seconds = float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+class StubConfig:
+    def __init__(self, token_ms=20.0, tokens=80, prefill_ms_per_kchar=5.0, parallel=1, think_tokens=0,
+                 load_ms=0.0, keep_alive_seconds=300.0, prefix_cache=True, prefix_slots=4):
+        self.token_ms = token_ms
+        self.tokens = tokens
+        self.prefill_ms_per_kchar = prefill_ms_per_kchar
+        self.think_tokens = think_tokens
+        self.load_ms = load_ms
+        self.keep_alive_seconds = keep_alive_seconds
+        self.prefix_cache = prefix_cache
+        self.prefix_slots = prefix_slots
+        # Ollama serves OLLAMA_NUM_PARALLEL requests per model at once and queues the rest
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.state_lock = threading.Lock()
+        self.expires_at = {}
+        self.cached_prompts = {}
+
+    def load_seconds(self, model, keep_alive):
+        """Cost of making sure the model is loaded, and refresh its unload timer"""
+        now = time.monotonic()
+        with self.state_lock:
+            loaded = self.expires_at.get(model, 0) > now
+            self.expires_at[model] = now + parse_keep_alive(keep_alive, self.keep_alive_seconds)
+            if not loaded:
+                self.cached_prompts.pop(model, None)
+        return 0.0 if loaded else self.load_ms / 1000
+
+    def prefill_chars(self, model, prompt):
+        """Characters that miss the prefix cache, then remember this prompt"""
+        if not self.prefix_cache:
+            return len(prompt)
+        with self.state_lock:
+            recent = self.cached_prompts.setdefault(model, [])
+            shared = max((len(os.path.commonprefix([prompt, p])) for p in recent), default=0)
+            recent.insert(0, prompt)
+            del recent[self.prefix_slots:]
+        return len(prompt) - shared
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json({"models": []})
+            elif self.path == "/api/version":
+                self._json({"version": "stub"})
+            else:
+                self._json({"status": "ok"})
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path not in ("/api/generate", "/api/chat"):
+                self._json({"error": "not found"}, status=404)
+                return
+            chat = self.path == "/api/chat"
+            prompt = (json.dumps(payload.get("messages", [])) if chat else payload.get("prompt", "")) or ""
+            model = payload.get("model", "stub")
+            load = config.load_seconds(model, payload.get("keep_alive"))
+            if not chat and not prompt:
+                # An empty prompt only loads the model, as in Ollama
+                time.sleep(load)
+                self._json({"model": model, "created_at": _now(), "response": "", "done": True,
+                            "done_reason": "load", "load_duration": int(load * 1e9)})
+                return
+            self._stream(model, prompt, chat, payload.get("stream", True), load)
+
+        def prefill_seconds(self, model, prompt):
+            return config.prefill_chars(model, prompt) / 1000 * config.prefill_ms_per_kchar / 1000
+
+        def _tokens(self):
+            tokens = []
+            if config.think_tokens:
+                tokens.append("<think>")
+                tokens += [random.choice(WORDS) + " " for _ in range(config.think_tokens)]
+                tokens.append("</think>\n")
+            tokens += [random.choice(WORDS) + " " for _ in range(config.tokens)]
+            return tokens
+
+        def _stream(self, model, prompt, chat, stream, load=0.0):
+            with config.slots:
+                started = time.perf_counter()
+                prefill = self.prefill_seconds(model, prompt)
+                time.sleep(load + prefill)
+                tokens = self._tokens()
+
+                def frame(text, done):
+                    item = {"model": model, "created_at": _now(), "done": done}
+                    if chat:
+                        item["message"] = {"role": "assistant", "content": text}
+                    else:
+                        item["response"] = text
+                    if done:
+                        item.update({
+                            "done_reason": "stop",
+                            "total_duration": int((time.perf_counter() - started) * 1e9),
+                            "load_duration": int(load * 1e9),
+                            "prompt_eval_count": len(prompt) // 4,
+                            "prompt_eval_duration": int(prefill * 1e9),
+                            "eval_count": len(tokens),
+                            "eval_duration": int(len(tokens) * config.token_ms * 1e6),
+                        })
+                    return item
+
+                if not stream:
+                    time.sleep(len(tokens) * config.token_ms / 1000)
+                    self._json(frame("".join(tokens), True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(config.token_ms / 1000)
+                    self._chunk(json.dumps(frame(token, False)) + "\n")
+                self._chunk(json.dumps(frame("", True)) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, text):
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--token-ms", type=float, default=20.0, help="Delay between streamed tokens")
+    parser.add_argument("--tokens", type=int, default=80, help="Answer tokens per response")
+    parser.add_argument("--think-tokens", type=int, default=0, help="Tokens inside a leading <think> block")
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=5.0, help="Prompt processing cost")
+    parser.add_argument("--parallel", type=int, default=1, help="Requests served at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Model load time after it was unloaded")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="Default seconds a model stays loaded")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Prefill the whole prompt every time")
+    return parser
+
+
+def serve(handler, host, port):
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Stub Ollama listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+def main():
+    args = build_parser().parse_args()
+    config = StubConfig(args.token_ms, args.tokens, args.prefill_ms_per_kchar, args.parallel, args.think_tokens,
+                        args.load_ms, args.keep_alive, not args.no_prefix_cache)
+    serve(make_handler(config), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,165 @@
-import os, re, time, logging, sqlite3, io
+import os, re, time, logging, sqlite3, io, hashlib, threading
+from collections import OrderedDict
 from datetime import datetime
-from PIL import Image, ImageFilter
 from docx import Document
 import PyPDF2
 import random
-import pytesseract
 import requests
-import pyttsx3
 from duckduckgo_search import DDGS
 from sympy import sympify
 from langchain.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
-from langchain.schema.runnable import RunnablePassthrough
 from langchain.memory import ConversationBufferMemory
 from langchain_ollama.llms import OllamaLLM
 from langchain_community.embeddings import FastEmbedEmbeddings
+from langchain_community.chat_message_histories import SQLChatMessageHistory
+from sqlalchemy import create_engine
 import chromadb
+from .tts_service import SpeechRenderer
+from .image_processing import ocr_image, ImageTooLargeError
+from .model_router import ModelRouter, ThinkStripper, strip_think
+from .shared_state import SQLiteWriteLock, RemoteEmbeddings
+from .document_analysis import DocumentAnalyzer
+from .chunk_store import ChunkStore
+from .embedding_batcher import EmbeddingBatcher
+from .prompts import SYSTEM_PROMPT, human_message
 
 class ChatbotEngine:
     SUPPORTED_DOC_TYPES = ('.pdf', '.docx', '.txt')
     SUPPORTED_IMAGE_TYPES = ('.png', '.jpg', '.jpeg')
-
-    def __init__(self):
+    # Defaults for the models; simple queries fall back to the reasoning model if the fast one fails
+    FAST_MODEL = "llama3.2:3b"
+    REASONING_MODEL = "deepseek-r1:latest"
+    MAX_SIMPLE_WORDS = 25
+    # How long Ollama keeps a model loaded after each request
+    KEEP_ALIVE = "30m"
+    # Map-reduce analysis calls the LLM at most this many times at once across all requests
+    ANALYSIS_CONCURRENCY = 4
+    DB_PATH = "chatbot_memory.db"
+    CHROMA_PATH = "./chroma_db"
+    TTS_CACHE_DIR = os.path.join("media", "tts_cache")
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 100
+    ANONYMOUS_OWNER = "anonymous"
+    RETRIEVAL_RESULTS = 4
+    # Conversation turns per owner replayed into the prompt, and owners kept in memory at once.
+    # History grows to twice MEMORY_TURNS and is then cut back to MEMORY_TURNS in one step, so it
+    # stays append-only (and prefix-cacheable) between cuts instead of sliding every turn.
+    MEMORY_TURNS = 5
+    MEMORY_OWNERS = 1000
+    # Chunks further away than this (squared L2 between normalised embeddings, i.e. 2 - 2 * cosine)
+    # are too unrelated to ground an answer, and would needlessly route it to the reasoning model
+    MAX_RETRIEVAL_DISTANCE = 0.8
+
+    GREETINGS = (
+        "Hello! I'm Thara Chat. How can I help you today?",
+        "Hi there! 😊 I'm your AI assistant. What can I do for you?",
+        "Greetings! I'm here to help. What do you need assistance with?"
+    )
+    REPEAT_GREETINGS = (
+        "Hello again! 😊 What can I do for you?",
+        "Nice to see you again! How can I assist?",
+        "Welcome back! What would you like help with today?"
+    )
+    THANK_YOU_RESPONSES = (
+        "You're very welcome! 😊 Let me know if you need anything else.",
+        "Happy to help! Don't hesitate to ask if you have more questions.",
+        "Glad I could assist! Feel free to reach out anytime.",
+        "My pleasure! Remember I'm here whenever you need support."
+    )
+
+    def __init__(self, partitioned_owners=(), shared_memory=False, chroma_host=None, chroma_port=8000,
+                 embedding_url=None, embed_batch_size=32, embed_max_wait_ms=5,
+                 fast_model=None, reasoning_model=None, max_simple_words=MAX_SIMPLE_WORDS):
+        self.fast_model = fast_model or self.FAST_MODEL
+        self.reasoning_model = reasoning_model or self.REASONING_MODEL
+        self.max_simple_words = max_simple_words
+        # Owners listed here get their own Chroma collection instead of sharing document_qna
+        self.partitioned_owners = set(partitioned_owners)
+        # Multi-worker deployments keep conversation memory in SQLite, talk to one Chroma server
+        # and share a single embedding service instead of loading the model in every worker
+        self.shared_memory = shared_memory
+        self.chroma_host = chroma_host
+        self.chroma_port = chroma_port
+        self.embedding_url = embedding_url
+        # Concurrent query embeddings are coalesced into batches of up to this size
+        self.embed_batch_size = embed_batch_size
+        self.embed_max_wait_ms = embed_max_wait_ms
+        self.write_lock = SQLiteWriteLock(self.DB_PATH)
         self.initialize_llm()
         self.initialize_memory()
         self.initialize_database()
+        self.initialize_analysis()
         self.initialize_vector_db()
         self.initialize_tts()
 
     def initialize_llm(self):
-        self.llm = OllamaLLM(model="deepseek-r1:latest", temperature=0.7)
+        self.router = ModelRouter(self.fast_model, self.reasoning_model, max_simple_words=self.max_simple_words)
+        # Stable system prompt first, then history (append-only between trims, see MEMORY_TURNS),
+        # then the per-turn text, so consecutive requests share the longest cached prompt prefix
         self.prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are Thara Chat, a helpful AI assistant. Provide concise, friendly responses."),
+            ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{text}")
         ])
-        self.llm_chain = (
-            RunnablePassthrough.assign(
-                chat_history=lambda x: self.memory.load_memory_variables(x)["chat_history"]
-            )
-            | self.prompt
-            | self.llm
-        )
+        self.llms = {
+            model: OllamaLLM(model=model, temperature=0.7, keep_alive=self.KEEP_ALIVE)
+            for model in (self.fast_model, self.reasoning_model)
+        }
+        self.llm = self.llms[self.reasoning_model]
+        # The caller supplies chat_history from the asking owner's memory
+        self.llm_chains = {model: self.prompt | llm for model, llm in self.llms.items()}
+        self.llm_chain = self.llm_chains[self.reasoning_model]
 
 
     def initialize_memory(self):
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        # One memory per owner, least recently used evicted first. With shared_memory
+        # the messages live in SQLite (message_store) so every worker sees the same conversation.
+        self.memories = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self.memory_engine = create_engine(f"sqlite:///{self.DB_PATH}") if self.shared_memory else None
+
+    def memory_for(self, owner=ANONYMOUS_OWNER):
+        """The conversation memory of one owner"""
+        with self._memory_lock:
+            memory = self.memories.get(owner)
+            if memory is not None:
+                self.memories.move_to_end(owner)
+                return memory
+            options = {}
+            if self.shared_memory:
+                options["chat_memory"] = SQLChatMessageHistory(session_id=owner, connection=self.memory_engine)
+            memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True, **options)
+            self.memories[owner] = memory
+            if len(self.memories) > self.MEMORY_OWNERS:
+                self.memories.popitem(last=False)
+            return memory
+
+    def _trim_memory(self, owner, memory):
+        """Cut an owner's history back to MEMORY_TURNS once it reaches twice that; caller holds write_lock"""
+        keep = 2 * self.MEMORY_TURNS  # a turn is a question and an answer
+        if not self.shared_memory:
+            messages = memory.chat_memory.messages
+            if len(messages) >= 2 * keep:
+                memory.chat_memory.messages = messages[-keep:]
+            return
+        count = self.conn.execute(
+            "SELECT COUNT(*) FROM message_store WHERE session_id = ?", (owner,)
+        ).fetchone()[0]
+        if count >= 2 * keep:
+            self.conn.execute(
+                "DELETE FROM message_store WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM message_store WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (owner, owner, keep)
+            )
+            self.conn.commit()
 
 
 
     def initialize_database(self):
-        self.conn = sqlite3.connect("chatbot_memory.db", check_same_thread=False)
+        self.conn = sqlite3.connect(self.DB_PATH, check_same_thread=False, timeout=30)
         self.cursor = self.conn.cursor()
+        # WAL lets other workers keep reading while one of them writes
+        self.cursor.execute("PRAGMA journal_mode=WAL")
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS chat_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -68,63 +177,262 @@ class ChatbotEngine:
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP  
             )
         """)
+        self._ensure_column("documents", "owner", "TEXT DEFAULT 'anonymous'")
+        self._ensure_column("documents", "workspace", "TEXT DEFAULT ''")
+        self._ensure_column("chat_history", "owner", "TEXT DEFAULT 'anonymous'")
+        # Keyset pagination walks one owner's history by id
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_owner ON chat_history (owner, id)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_owner ON documents (owner, workspace)"
+        )
+        # Greeting/repeat lookups and retention pruning all scan chat_history by these columns
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)"
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_history_query ON chat_history (user_query, timestamp)"
+        )
         self.conn.commit()
+        self.chunk_store = ChunkStore(self.conn)
+
+    def _ensure_column(self, table, column, declaration):
+        """Add a column to an existing table created by an older version of the schema"""
+        columns = [row[1] for row in self.cursor.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+    def initialize_analysis(self):
+        # Chunk summaries use the fast model; only the final write-up needs the reasoning model
+        self.analyzer = DocumentAnalyzer(
+            self.conn, self.write_lock,
+            summarize_llm=self.llms[self.fast_model],
+            final_llm=self.llms[self.reasoning_model],
+            concurrency=self.ANALYSIS_CONCURRENCY
+        )
 
     def initialize_vector_db(self):
-        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        self.initialize_vector_client()
+        self._start_embedding_batcher(self._base_embeddings())
+
+    def _base_embeddings(self):
+        if self.embedding_url:
+            return RemoteEmbeddings(self.embedding_url)
+        return FastEmbedEmbeddings()
+
+    def _start_embedding_batcher(self, base):
+        self.embedding_model = EmbeddingBatcher(
+            base, max_batch=self.embed_batch_size, max_wait_ms=self.embed_max_wait_ms
+        )
+
+    def initialize_vector_client(self):
+        if self.chroma_host:
+            self.chroma_client = chromadb.HttpClient(host=self.chroma_host, port=self.chroma_port)
+        else:
+            self.chroma_client = chromadb.PersistentClient(path=self.CHROMA_PATH)
         self.doc_collection = self.chroma_client.get_or_create_collection(name="document_qna")
-        self.embedding_model = FastEmbedEmbeddings()
+        self.owner_collections = {}
 
-    def initialize_tts(self):
+    def reinitialize_after_fork(self):
+        """Re-open per-process resources in a worker forked from a preloaded master.
+
+        SQLite connections, Chroma clients, locks, the embedding model and the TTS worker
+        thread must not be shared across fork; only the LLM clients are kept.
+        """
+        # A lock the master's retention thread held at fork time would stay held forever here
+        self.write_lock = SQLiteWriteLock(self.DB_PATH)
+        self.initialize_memory()
+        self.initialize_database()
+        self.initialize_analysis()
+        if not self.chroma_host:
+            # PersistentClient caches its system per path, which would hand back the parent's
+            chromadb.api.client.SharedSystemClient.clear_system_cache()
+        self.initialize_vector_client()
+        # The batcher's worker thread does not survive fork, and onnxruntime sessions are not
+        # fork-safe, so each worker loads its own model unless it uses the embedding service
+        self._start_embedding_batcher(self._base_embeddings())
+        self.initialize_tts()
+
+    def _collection_for(self, owner):
+        """Large tenants get a dedicated collection; everyone else shares document_qna"""
+        if owner not in self.partitioned_owners:
+            return self.doc_collection
+        if owner not in self.owner_collections:
+            # Chroma restricts collection names, so derive a safe one from the owner
+            name = f"document_qna_{hashlib.sha256(owner.encode('utf-8')).hexdigest()[:16]}"
+            self.owner_collections[owner] = self.chroma_client.get_or_create_collection(name=name)
+        return self.owner_collections[owner]
+
+    def _scope_filter(self, owner, workspace=None):
+        if workspace:
+            return {"$and": [{"owner": owner}, {"workspace": workspace}]}
+        return {"owner": owner}
+
+    def search_documents(self, query, owner=ANONYMOUS_OWNER, workspace=None, n_results=RETRIEVAL_RESULTS,
+                         max_distance=MAX_RETRIEVAL_DISTANCE):
+        """Return (embedding_id, text) for the owner's chunks relevant to the query, best first.
+
+        Never crosses owners.
+        """
         try:
-            self.tts_engine = pyttsx3.init()
-            self.voices = self.tts_engine.getProperty('voices')
-            self.current_voice = 0
+            results = self._collection_for(owner).query(
+                query_embeddings=[self.embedding_model.embed_query(query)],
+                n_results=n_results,
+                where=self._scope_filter(owner, workspace),
+                include=["metadatas", "documents", "distances"]
+            )
+            metadatas = results["metadatas"][0] if results.get("metadatas") else []
+            snippets = results["documents"][0] if results.get("documents") else [""] * len(metadatas)
+            distances = results["distances"][0] if results.get("distances") else [0.0] * len(metadatas)
+            # The top-n always come back, however unrelated; keep only the ones that are close
+            matches = [
+                (meta, snippet) for meta, snippet, distance in zip(metadatas, snippets, distances)
+                if distance <= max_distance
+            ]
+            metadatas = [meta for meta, _ in matches]
+            snippets = [snippet for _, snippet in matches]
+            keys = [(meta.get("embedding_id"), meta.get("chunk")) for meta in metadatas]
+            # Only the matched chunks are read from SQLite and decompressed
+            texts = self.chunk_store.get(key for key in keys if None not in key)
         except Exception as e:
-            print(f"TTS Init Error: {e}")
-            self.tts_engine = None
+            logging.error(f"Document search failed: {e}")
+            return []
+        # Vectors stored before the chunk store kept their full text in Chroma
+        return [(key[0], texts.get(key, snippet)) for key, snippet in zip(keys, snippets)]
+
+    def initialize_tts(self):
+        self.tts = SpeechRenderer(cache_dir=self.TTS_CACHE_DIR)
+        self.voices = self.tts.voices
+        self.current_voice = 0
+
+    def speak(self, text, voice=None, rate=None):
+        """Render a response to audio, returning (cache filename, was_cached)"""
+        voice = self.current_voice if voice is None else voice
+        # Canned responses are pinned so eviction never forces them to be re-synthesized
+        return self.tts.render(text, voice=voice, rate=rate, pinned=text in self._canned_responses())
+
+    def _canned_responses(self):
+        if not hasattr(self, "_canned_cache"):
+            self._canned_cache = frozenset(
+                self.GREETINGS + self.REPEAT_GREETINGS + self.THANK_YOU_RESPONSES +
+                (self._describe_identity(), self._list_services(), self._list_services(True))
+            )
+        return self._canned_cache
 
-    def process_document(self, file_path):
+    def process_document(self, file_path, owner=ANONYMOUS_OWNER, workspace=None):
         """Processes a document with friendly, detailed feedback"""
+        return self.ingest_document(file_path, owner, workspace)[1]
+
+    def ingest_document(self, file_path, owner=ANONYMOUS_OWNER, workspace=None):
+        """Extract and store a document, returning (text, feedback); text is empty on failure"""
         if not os.path.exists(file_path):
-            return "Oops! I couldn't find that file. Could you double-check the path?"
+            return "", "Oops! I couldn't find that file. Could you double-check the path?"
             
         text = self._extract_text(file_path)
         if not text.strip():
-            return "Hmm, I couldn't extract any text from this document. It might be an image-based PDF or the file might be corrupted."
+            return "", "Hmm, I couldn't extract any text from this document. It might be an image-based PDF or the file might be corrupted."
 
-        doc_id = f"doc_{hash(text)}"
         doc_name = os.path.basename(file_path)
 
         try:
-            self.cursor.execute(
-                "INSERT OR REPLACE INTO documents (filename, content, embedding_id) VALUES (?, ?, ?)",
-                (doc_name, text, doc_id)
-            )
-            self.conn.commit()
-
-            embedding = self.embedding_model.embed_query(text)
-            self.doc_collection.upsert(
-                ids=[doc_id],
-                embeddings=[embedding],
-                documents=[text],
-                metadatas=[{
-                    "source": file_path,
-                    "name": doc_name,
-                    "type": os.path.splitext(file_path)[1][1:],
-                    "timestamp": datetime.now().isoformat()
-                }]
-            )
+            self._store_document(file_path, text, owner, workspace)
 
             doc_stats = f"📄 Document: {doc_name}\n"
             doc_stats += f"📝 Characters: {len(text):,}\n"
             doc_stats += f"📂 Type: {os.path.splitext(file_path)[1].upper()[1:]}\n"
             doc_stats += "✅ Successfully processed and stored!"
-            return doc_stats
+            return text, doc_stats
         except Exception as e:
             self.conn.rollback()
             logging.error(f"Document processing error: {e}")
-            return "I encountered an issue while processing this document. Here's what happened:\n" + str(e)
+            return "", "I encountered an issue while processing this document. Here's what happened:\n" + str(e)
+
+    def analyze_document(self, text, progress=None, owner=ANONYMOUS_OWNER, workspace=None):
+        """Analyze a whole document with map-reduce summarisation instead of one huge prompt"""
+        try:
+            document_id = self._document_id(text, owner, workspace)
+            return self._format_response(self.analyzer.analyze(text, progress, document_id))
+        except Exception as e:
+            logging.error(f"Document analysis error: {e}")
+            return "I stored your document but couldn't finish analyzing it. You can still ask me questions about it."
+
+    def process_image(self, file_path, owner=ANONYMOUS_OWNER, workspace=None):
+        """OCRs an image with bounded memory and stores the text like a document"""
+        if not os.path.exists(file_path):
+            return "Oops! I couldn't find that image. Could you double-check the path?"
+
+        doc_name = os.path.basename(file_path)
+        try:
+            text, stats = ocr_image(file_path)
+        except ImageTooLargeError as e:
+            return f"That image is too large for me to read safely. {e}"
+        except Exception as e:
+            logging.error(f"Image processing error: {e}")
+            return "I couldn't read this image. It might be corrupted or in an unsupported format."
+
+        if not text.strip():
+            return "Hmm, I couldn't find any readable text in this image."
+
+        try:
+            _, chunk_count = self._store_document(file_path, text, owner, workspace)
+
+            width, height = stats["original_size"]
+            image_stats = f"🖼️ Image: {doc_name}\n"
+            image_stats += f"📐 Size: {width}x{height}"
+            if stats["decoded_size"] != stats["original_size"]:
+                image_stats += " (read at {}x{})".format(*stats["decoded_size"])
+            image_stats += f"\n📝 Characters: {len(text):,} in {chunk_count} chunk(s)\n"
+            image_stats += f"🧠 Estimated peak image memory: {stats['estimated_peak_bytes'] / (1024 * 1024):.1f} MB\n"
+            image_stats += "✅ Successfully processed and stored!"
+            return image_stats
+        except Exception as e:
+            self.conn.rollback()
+            logging.error(f"Image storage error: {e}")
+            return "I read the image but couldn't store its text. Here's what happened:\n" + str(e)
+
+    def _chunk_text(self, text):
+        step = self.CHUNK_SIZE - self.CHUNK_OVERLAP
+        return [text[i:i + self.CHUNK_SIZE] for i in range(0, max(len(text) - self.CHUNK_OVERLAP, 1), step)]
+
+    def _document_id(self, text, owner=ANONYMOUS_OWNER, workspace=None):
+        # Scope the id by owner so identical uploads from two users never overwrite each other
+        return "doc_" + hashlib.sha256(f"{owner}\0{workspace or ''}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+    def _store_document(self, file_path, text, owner=ANONYMOUS_OWNER, workspace=None):
+        """Record extracted text in SQLite and embed it chunk by chunk in Chroma"""
+        workspace = workspace or ""
+        doc_id = self._document_id(text, owner, workspace)
+        doc_name = os.path.basename(file_path)
+
+        chunks = self._chunk_text(text)
+        # The text lives only in the compressed chunk store; documents.content stays empty
+        with self.write_lock:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO documents (filename, content, embedding_id, owner, workspace) VALUES (?, NULL, ?, ?, ?)",
+                (doc_name, doc_id, owner, workspace)
+            )
+            self.chunk_store.put(doc_id, chunks)
+            self.conn.commit()
+
+        embeddings = self.embedding_model.embed_documents(chunks)
+        timestamp = datetime.now().isoformat()
+        self._collection_for(owner).upsert(
+            ids=[f"{doc_id}_{i}" for i in range(len(chunks))],
+            embeddings=embeddings,
+            documents=[ChunkStore.snippet(chunk) for chunk in chunks],
+            metadatas=[{
+                "source": file_path,
+                "name": doc_name,
+                "type": os.path.splitext(file_path)[1][1:],
+                "timestamp": timestamp,
+                "embedding_id": doc_id,
+                "chunk": i,
+                "owner": owner,
+                "workspace": workspace
+            } for i in range(len(chunks))]
+        )
+        return doc_id, len(chunks)
 
     def _extract_text(self, file_path):
         ext = os.path.splitext(file_path)[1].lower()
@@ -140,8 +448,8 @@ class ChatbotEngine:
                 doc = Document(file_path)
                 return '\n'.join([p.text for p in doc.paragraphs])
             elif ext in self.SUPPORTED_IMAGE_TYPES:
-                img = Image.open(file_path)
-                return pytesseract.image_to_string(img)
+                text, _ = ocr_image(file_path)
+                return text
             elif ext == '.txt':
                 with open(file_path, 'r', encoding='utf-8') as f:
                     return f.read()
@@ -150,24 +458,16 @@ class ChatbotEngine:
             return ""
         return ""
 
-    def general_query(self, query):
+    def general_query(self, query, owner=ANONYMOUS_OWNER, workspace=None):
         """Handle general user queries with improved response handling"""
         # Clean the query for comparison
         clean_query = query.lower().strip()
         
         # Check for repeated greetings first
         if clean_query in ("hi", "hello", "hey"):
-            if self._is_repeated_greeting():
-                return random.choice([
-                    "Hello again! 😊 What can I do for you?",
-                    "Nice to see you again! How can I assist?",
-                    "Welcome back! What would you like help with today?"
-                ])
-            return random.choice([
-                "Hello! I'm Thara Chat. How can I help you today?",
-                "Hi there! 😊 I'm your AI assistant. What can I do for you?",
-                "Greetings! I'm here to help. What do you need assistance with?"
-            ])
+            if self._is_repeated_greeting(owner):
+                return random.choice(self.REPEAT_GREETINGS)
+            return random.choice(self.GREETINGS)
 
         # Handle identity questions
         if any(phrase in clean_query for phrase in ["who are you", "what are you", "your name"]):
@@ -193,25 +493,36 @@ class ChatbotEngine:
         # Default case - use LLM for all other queries
         try:
             # Check for repeated question first
-            previous_answer = self._check_repeated_question(query)
+            previous_answer = self._check_repeated_question(query, owner)
             if previous_answer:
                 return previous_answer
 
+            # Ground the answer in the user's own documents, if they have any
+            matches = self.search_documents(query, owner, workspace)
+            # Documents analysed earlier contribute their cached summary as an overview
+            summaries = self.analyzer.summaries_for({doc_id for doc_id, _ in matches if doc_id})
+            context = "\n\n".join(
+                [f"Document overview:\n{summary}" for summary in summaries.values()] +
+                [text for _, text in matches]
+            )
+
             # Generate response using LLM
-            response = self._generate_response(query)
+            response = self._generate_response(query, context, owner)
             return self._format_response(response)
             
         except Exception as e:
             logging.error(f"Error generating response: {e}")
             return "I encountered an error while processing your request. Please try again."
 
-    def _is_repeated_greeting(self):
+    def _is_repeated_greeting(self, owner=ANONYMOUS_OWNER):
         """Check if the last message was also a greeting"""
         try:
-            self.cursor.execute(
-                "SELECT user_query FROM chat_history ORDER BY timestamp DESC LIMIT 1"
-            )
-            last_query = self.cursor.fetchone()
+            # A cursor per call: request threads share self.conn, and another thread's execute
+            # on a shared cursor could land between our execute and fetch
+            last_query = self.conn.execute(
+                "SELECT user_query FROM chat_history WHERE owner = ? ORDER BY id DESC LIMIT 1",
+                (owner,)
+            ).fetchone()
             if last_query and last_query[0].lower().strip() in ("hi", "hello", "hey"):
                 return True
         except Exception as e:
@@ -263,31 +574,42 @@ class ChatbotEngine:
 
 
     def _thank_you_response(self):
-        responses = [
-            "You're very welcome! 😊 Let me know if you need anything else.",
-            "Happy to help! Don't hesitate to ask if you have more questions.",
-            "Glad I could assist! Feel free to reach out anytime.",
-            "My pleasure! Remember I'm here whenever you need support."
-        ]
-        return random.choice(responses)
-
-    def _generate_response(self, question, context=""):
-        prompt_text = (
-            f"Please provide a helpful, friendly response to the following question.\n"
-            f"Be conversational but informative, and use markdown formatting when helpful.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {question}\n\n"
-            f"Response:"
-        )
+        return random.choice(self.THANK_YOU_RESPONSES)
 
-        result = self.llm_chain.invoke({
-            "chat_history": self.memory.load_memory_variables({})["chat_history"],
+    def _generate_response(self, question, context="", owner=ANONYMOUS_OWNER):
+        prompt_text = human_message(question, context)
+
+        inputs = {
+            "chat_history": self.memory_for(owner).load_memory_variables({})["chat_history"],
             "text": prompt_text
-        })
+        }
 
-        if isinstance(result, dict) and "text" in result:
-            return result["text"]
-        return str(result)
+        model, reason = self.router.route(question, context)
+        started = time.perf_counter()
+        try:
+            answer = self._stream_answer(model, inputs)
+        except Exception as e:
+            if model == self.reasoning_model:
+                raise
+            # e.g. the fast model was never pulled on this install
+            logging.warning(f"Model {model} failed ({e}); falling back to {self.reasoning_model}")
+            model, reason = self.router.fallback()
+            started = time.perf_counter()
+            answer = self._stream_answer(model, inputs)
+
+        self.router.record(model, reason, started)
+        return answer
+
+    def _stream_answer(self, model, inputs):
+        # Reasoning traces are dropped as they stream in, so they never reach _format_response
+        stripper = ThinkStripper()
+        parts = []
+        for chunk in self.llm_chains[model].stream(inputs):
+            if isinstance(chunk, dict):
+                chunk = chunk.get("text", "")
+            parts.append(stripper.feed(str(chunk)))
+        parts.append(stripper.flush())
+        return strip_think("".join(parts), saw_open=stripper.saw_open)
 
 
     
@@ -311,14 +633,13 @@ class ChatbotEngine:
             "\n\nJust let me know what you need assistance with!"
         )
 
-    def _check_repeated_question(self, query):
+    def _check_repeated_question(self, query, owner=ANONYMOUS_OWNER):
         """Check if this question was asked before and return previous answer if found"""
         try:
-            self.cursor.execute(
-                "SELECT bot_response FROM chat_history WHERE user_query = ? ORDER BY timestamp DESC LIMIT 1",
-                (query,)
-            )
-            result = self.cursor.fetchone()
+            result = self.conn.execute(
+                "SELECT bot_response FROM chat_history WHERE user_query = ? AND owner = ? ORDER BY timestamp DESC LIMIT 1",
+                (query, owner)
+            ).fetchone()
             if result:
                 return f"I remember answering this before:\n\n{result[0]}\n\nLet me know if you need more details!"
         except Exception as e:
@@ -327,6 +648,9 @@ class ChatbotEngine:
     
     def _format_response(self, text):
         """Formats responses to be more conversational"""
+        if not text:
+            return "I'm not sure how to answer that. Could you rephrase your question?"
+
         # Add friendly touches to responses
         if not any(text.startswith(x) for x in ["I", "You", "We", "The", "This"]):
             text = f"I found that {text[0].lower() + text[1:]}"
@@ -344,25 +668,79 @@ class ChatbotEngine:
     
     
 
-    def _store_conversation(self, query, response):
+    def _store_conversation(self, query, response, owner=ANONYMOUS_OWNER):
         """Store the conversation in database"""
         try:
-            self.cursor.execute(
-                "INSERT INTO chat_history (user_query, bot_response) VALUES (?, ?)",
-                (query, response)
-            )
-            self.conn.commit()
-            
-            # Also update memory for immediate context
-            self.memory.save_context(
-                {"input": query},
-                {"output": response}
-            )
+            with self.write_lock:
+                self.cursor.execute(
+                    "INSERT INTO chat_history (user_query, bot_response, owner) VALUES (?, ?, ?)",
+                    (query, response, owner)
+                )
+                self.conn.commit()
+
+                # Also update memory for immediate context; uploads without a question have nothing
+                # to recall. With shared_memory this writes message_store, so it stays under the lock.
+                if not query:
+                    return
+                memory = self.memory_for(owner)
+                memory.save_context(
+                    {"input": query},
+                    {"output": response}
+                )
+                self._trim_memory(owner, memory)
         except Exception as e:
             logging.error(f"Error storing conversation: {e}")
             self.conn.rollback()
 
 
+    def history_page(self, owner, before=None, limit=50):
+        """One page of an owner's chat history, newest first, using an id cursor instead of OFFSET"""
+        # One extra row tells whether another page exists, so the last page has no cursor
+        if before is None:
+            rows = self.conn.execute(
+                "SELECT id, user_query, bot_response, timestamp FROM chat_history "
+                "WHERE owner = ? ORDER BY id DESC LIMIT ?",
+                (owner, limit + 1)
+            ).fetchall()
+        else:
+            rows = self.conn.execute(
+                "SELECT id, user_query, bot_response, timestamp FROM chat_history "
+                "WHERE owner = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (owner, before, limit + 1)
+            ).fetchall()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, rows[-1][0]
+
+    def iter_history(self, owner=None, batch_size=1000):
+        """Yield chat history oldest first in fixed-size keyset batches, for exports of any size.
+
+        Uses its own connection so a long export never holds a transaction open on self.conn.
+        """
+        conn = sqlite3.connect(self.DB_PATH, timeout=30)
+        try:
+            last_id = 0
+            while True:
+                if owner is None:
+                    rows = conn.execute(
+                        "SELECT id, owner, user_query, bot_response, timestamp FROM chat_history "
+                        "WHERE id > ? ORDER BY id LIMIT ?",
+                        (last_id, batch_size)
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        "SELECT id, owner, user_query, bot_response, timestamp FROM chat_history "
+                        "WHERE owner = ? AND id > ? ORDER BY id LIMIT ?",
+                        (owner, last_id, batch_size)
+                    ).fetchall()
+                if not rows:
+                    break
+                yield from rows
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
+
     def _is_math_expression(self, query):
         return re.fullmatch(r"[0-9\+\-\*/\.\(\)xX÷\^ ]+", query.strip())
 
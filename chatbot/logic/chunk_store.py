@@ -0,0 +1,83 @@
+import threading, zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib frames are always readable
+    zstandard = None
+
+
+class ChunkStore:
+    """Compressed, chunk-addressable storage for document text.
+
+    Each embedded chunk is stored once as its own compressed frame, keyed by
+    (embedding_id, chunk), so retrieval decompresses only the chunks it needs.
+    Chroma keeps just a short snippet for inspection.
+    """
+    SNIPPET_CHARS = 200
+
+    def __init__(self, conn, level=None):
+        self.conn = conn
+        self.codec = "zstd" if zstandard is not None else "zlib"
+        self.zstd_level = level or 9
+        self.level = level or 6
+        # zstd (de)compressor objects must not be used by two threads at once
+        self._local = threading.local()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_chunks (
+                embedding_id TEXT,
+                chunk INTEGER,
+                codec TEXT,
+                data BLOB,
+                PRIMARY KEY (embedding_id, chunk)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    @classmethod
+    def snippet(cls, text):
+        return text[:cls.SNIPPET_CHARS]
+
+    def _zstd(self):
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.zstd_level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.decompressor
+
+    def _compress(self, text):
+        data = text.encode("utf-8")
+        if self.codec == "zstd":
+            return self._zstd()[0].compress(data)
+        return zlib.compress(data, self.level)
+
+    def _decompress(self, codec, data):
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("This chunk was stored with zstd; install zstandard to read it")
+            return self._zstd()[1].decompress(data).decode("utf-8")
+        return zlib.decompress(data).decode("utf-8")
+
+    def put(self, embedding_id, chunks):
+        """Store chunks for a document; the caller commits (and holds the write lock)"""
+        self.conn.execute("DELETE FROM document_chunks WHERE embedding_id = ?", (embedding_id,))
+        self.conn.executemany(
+            "INSERT INTO document_chunks (embedding_id, chunk, codec, data) VALUES (?, ?, ?, ?)",
+            [(embedding_id, i, self.codec, self._compress(chunk)) for i, chunk in enumerate(chunks)]
+        )
+
+    def get(self, keys):
+        """Return {(embedding_id, chunk): text} for the requested chunks only"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        clause = " OR ".join(["(embedding_id = ? AND chunk = ?)"] * len(keys))
+        params = [value for key in keys for value in key]
+        rows = self.conn.execute(
+            f"SELECT embedding_id, chunk, codec, data FROM document_chunks WHERE {clause}", params
+        ).fetchall()
+        return {(row[0], row[1]): self._decompress(row[2], row[3]) for row in rows}
+
+    def delete_orphans(self):
+        """Drop chunks whose document row is gone; the caller commits"""
+        return self.conn.execute(
+            "DELETE FROM document_chunks WHERE embedding_id NOT IN (SELECT embedding_id FROM documents)"
+        ).rowcount
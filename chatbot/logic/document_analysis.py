@@ -0,0 +1,159 @@
+import hashlib, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from .model_router import strip_think
+
+
+class DocumentAnalyzer:
+    """Map-reduce analysis of long documents.
+
+    Chunks are summarised in parallel (bounded by a semaphore shared by every request),
+    the partial summaries are combined in groups until one remains, and a final pass
+    writes the analysis. Every summary is cached by the hash of its input, so re-uploads
+    and repeated analyses only pay for chunks that actually changed. The combined summary
+    is also kept per document so follow-up questions can use it as an overview.
+    """
+    CHUNK_CHARS = 6000
+    REDUCE_FANOUT = 6
+
+    MAP_PROMPT = (
+        "Summarize the following part of a document. Keep key facts, names, numbers and conclusions. "
+        "Use at most 8 bullet points.\n\n{text}\n\nSummary:"
+    )
+    REDUCE_PROMPT = (
+        "Combine these partial summaries of consecutive parts of one document into a single summary. "
+        "Remove repetition but keep every important fact.\n\n{text}\n\nCombined summary:"
+    )
+    FINAL_PROMPT = (
+        "Here is a summary of a document a user uploaded. Write a helpful, friendly analysis: "
+        "what the document is, its main points, and anything notable the user should pay attention to. "
+        "Use markdown formatting when helpful.\n\n{text}\n\nAnalysis:"
+    )
+
+    def __init__(self, conn, write_lock, summarize_llm, final_llm, concurrency=4):
+        self.conn = conn
+        self.write_lock = write_lock
+        self.summarize_llm = summarize_llm
+        self.final_llm = final_llm
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_summaries (
+                content_hash TEXT PRIMARY KEY,
+                summary TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS document_summaries (
+                embedding_id TEXT PRIMARY KEY,
+                summary TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.conn.commit()
+
+    def split(self, text):
+        """Split on paragraph boundaries into chunks of roughly CHUNK_CHARS"""
+        chunks, current = [], ""
+        for paragraph in text.split("\n"):
+            while len(paragraph) > self.CHUNK_CHARS:
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(paragraph[:self.CHUNK_CHARS])
+                paragraph = paragraph[self.CHUNK_CHARS:]
+            if len(current) + len(paragraph) + 1 > self.CHUNK_CHARS and current:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{paragraph}" if current else paragraph
+        if current.strip():
+            chunks.append(current)
+        return chunks
+
+    def analyze(self, text, progress=None, document_id=None):
+        """Return the analysis; progress(stage, done, total) is called as work completes"""
+        report = progress or (lambda stage, done, total: None)
+        level = self.split(text)
+        stage = "summarizing"
+        while len(level) > 1 or stage == "summarizing":
+            prompt = self.MAP_PROMPT if stage == "summarizing" else self.REDUCE_PROMPT
+            if stage != "summarizing":
+                level = [
+                    "\n\n".join(level[i:i + self.REDUCE_FANOUT])
+                    for i in range(0, len(level), self.REDUCE_FANOUT)
+                ]
+            level = self._summarize_all(level, prompt, stage, report)
+            stage = "combining"
+        if document_id:
+            self._store_document_summary(document_id, level[0])
+        report("writing", 0, 1)
+        with self.slots:
+            analysis = strip_think(self.final_llm.invoke(self.FINAL_PROMPT.format(text=level[0])))
+        report("writing", 1, 1)
+        return analysis
+
+    def _summarize_all(self, texts, prompt, stage, report):
+        done = 0
+        lock = threading.Lock()
+        report(stage, 0, len(texts))
+
+        def summarize(text):
+            nonlocal done
+            summary = self._summarize(text, prompt)
+            with lock:
+                done += 1
+                report(stage, done, len(texts))
+            return summary
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(summarize, texts))
+
+    def _summarize(self, text, prompt):
+        key = hashlib.sha256(f"{prompt}\0{text}".encode("utf-8")).hexdigest()
+        row = self.conn.execute(
+            "SELECT summary FROM chunk_summaries WHERE content_hash = ?", (key,)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        with self.slots:
+            try:
+                summary = strip_think(self.summarize_llm.invoke(prompt.format(text=text)))
+            except Exception as e:
+                if self.summarize_llm is self.final_llm:
+                    raise
+                logging.warning(f"Summary model failed ({e}); using the final model instead")
+                summary = strip_think(self.final_llm.invoke(prompt.format(text=text)))
+        try:
+            with self.write_lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO chunk_summaries (content_hash, summary) VALUES (?, ?)",
+                    (key, summary)
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"Error caching chunk summary: {e}")
+        return summary
+
+    def _store_document_summary(self, document_id, summary):
+        try:
+            with self.write_lock:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO document_summaries (embedding_id, summary) VALUES (?, ?)",
+                    (document_id, summary)
+                )
+                self.conn.commit()
+        except Exception as e:
+            logging.error(f"Error storing document summary: {e}")
+
+    def summaries_for(self, document_ids):
+        """Return {embedding_id: summary} for the documents that have been analysed"""
+        document_ids = list(document_ids)
+        if not document_ids:
+            return {}
+        placeholders = ", ".join("?" * len(document_ids))
+        rows = self.conn.execute(
+            f"SELECT embedding_id, summary FROM document_summaries WHERE embedding_id IN ({placeholders})",
+            document_ids
+        ).fetchall()
+        return dict(rows)
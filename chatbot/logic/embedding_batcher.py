@@ -0,0 +1,112 @@
+import logging, queue, threading, time
+from concurrent.futures import Future
+
+
+def query_batch_function(embeddings):
+    """The wrapped model's batched query-embedding call, or None if it has none.
+
+    Query and passage encodings differ for asymmetric models, so queries are never sent
+    through embed_documents. RemoteEmbeddings exposes embed_queries; FastEmbed's underlying
+    model accepts a list in query_embed.
+    """
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries
+    model = getattr(embeddings, "model", None)
+    if model is not None and hasattr(model, "query_embed"):
+        return lambda texts: [vector.tolist() for vector in model.query_embed(texts)]
+    return None
+
+
+class EmbeddingBatcher:
+    """Coalesces embed_query calls from many threads into batched query-embedding calls.
+
+    A single worker waits up to max_wait_ms after the first request (or until max_batch
+    requests are queued), embeds the whole batch in one ONNX call and fans the vectors
+    back out to the waiting callers. Document embedding is already batched by the caller
+    and is passed straight through. Models without a batched query path are called
+    directly, one query at a time.
+    """
+
+    def __init__(self, embeddings, max_batch=32, max_wait_ms=5, timeout=30):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._embed_batch = query_batch_function(embeddings)
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._wait_total = 0.0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def embed_query(self, text):
+        if self._embed_batch is None:
+            return self.embeddings.embed_query(text)
+        future = Future()
+        self._requests.put((text, future, time.perf_counter()))
+        return future.result(timeout=self.timeout)
+
+    def embed_queries(self, texts):
+        """Embed several queries, queueing them all before waiting so they share batches"""
+        if self._embed_batch is None:
+            return [self.embeddings.embed_query(text) for text in texts]
+        futures = []
+        for text in texts:
+            future = Future()
+            self._requests.put((text, future, time.perf_counter()))
+            futures.append(future)
+        deadline = time.perf_counter() + self.timeout
+        return [future.result(timeout=max(deadline - time.perf_counter(), 0)) for future in futures]
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        with self._lock:
+            batches, items, wait_total = self._batches, self._items, self._wait_total
+        return {
+            "batches": batches,
+            "items": items,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_batch_size": round(items / batches, 2) if batches else 0.0,
+            "fill_ratio": round(items / (batches * self.max_batch), 3) if batches else 0.0,
+            "mean_queue_wait_ms": round(wait_total / items * 1000, 2) if items else 0.0,
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            try:
+                vectors = list(self._embed_batch([text for text, _, _ in batch]))
+            except Exception as e:
+                logging.error(f"Batched embedding failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            # Counted before the callers wake, so stats() read after a call includes it
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._wait_total += sum(started - queued for _, _, queued in batch)
+            for i, (_, future, _) in enumerate(batch):
+                if i < len(vectors):
+                    future.set_result(vectors[i])
+                else:
+                    future.set_exception(RuntimeError(
+                        f"Embedding model returned {len(vectors)} vectors for {len(batch)} queries"
+                    ))
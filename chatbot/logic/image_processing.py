@@ -0,0 +1,171 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageFilter, ImageOps
+import pytesseract
+
+# Images are rejected outright above this size, before any pixel data is decoded. Kept below
+# Pillow's own Image.MAX_IMAGE_PIXELS so the process-wide setting never needs changing.
+MAX_IMAGE_PIXELS = 80_000_000
+# Longest side the OCR input is reduced to; roughly an A4 page scanned at 300 DPI
+OCR_MAX_SIDE = 3500
+# Preprocessed images larger than this are split into strips and OCR'd in parallel
+TILE_PIXELS = 6_000_000
+# Rows searched on either side of a strip's nominal end for a blank row to cut at
+TILE_SEARCH_ROWS = 200
+TILE_WORKERS = 4
+THRESHOLD = 160
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+def _buffer_bytes(img):
+    # Pillow keeps 1-byte modes as bytes and widens everything else to 4 bytes per pixel
+    return img.width * img.height * (1 if img.mode in ('1', 'L', 'P') else 4)
+
+
+class BufferEstimate:
+    """Running total of the image buffers alive at once, and its high-water mark.
+
+    Pillow allocates pixel data outside the Python allocator, so tracemalloc can't see it;
+    the pipeline reports every buffer it creates or frees here instead.
+    """
+
+    def __init__(self):
+        self.live = 0
+        self.peak = 0
+
+    def add(self, nbytes):
+        self.live += nbytes
+        self.peak = max(self.peak, self.live)
+
+    def release(self, nbytes):
+        self.live -= nbytes
+
+
+def load_for_ocr(file_path, max_side=OCR_MAX_SIDE, max_pixels=MAX_IMAGE_PIXELS, estimate=None):
+    """Decode an image at OCR resolution, returning (image, stats).
+
+    JPEGs are decoded directly at a reduced scale with draft(), so the full-resolution
+    bitmap is never materialised. Other formats are decoded once and reduced immediately.
+    """
+    estimate = estimate or BufferEstimate()
+    try:
+        img = Image.open(file_path)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    original_size = img.size
+    if img.width * img.height > max_pixels:
+        img.close()
+        raise ImageTooLargeError(
+            f"Image is {img.width}x{img.height} pixels, above the {max_pixels:,} pixel limit"
+        )
+
+    scale = max(img.width, img.height) / max_side
+    if img.format == 'JPEG' and scale > 1:
+        img.draft('L', (int(img.width / scale), int(img.height / scale)))
+
+    img.load()
+    decoded_bytes = _buffer_bytes(img)
+    estimate.add(decoded_bytes)
+
+    if max(img.width, img.height) > max_side:
+        # The reduced copy is built while the decoded bitmap is still alive
+        img.thumbnail((max_side, max_side))
+        estimate.add(_buffer_bytes(img))
+        estimate.release(decoded_bytes)
+
+    return img, {
+        "original_size": original_size,
+        "decoded_size": img.size,
+        "decoded_bytes": decoded_bytes,
+    }
+
+
+def preprocess(img, estimate=None):
+    """Grayscale, denoise and binarise an image for tesseract"""
+    estimate = estimate or BufferEstimate()
+    steps = [
+        ImageOps.autocontrast,
+        lambda im: im.filter(ImageFilter.MedianFilter(3)),
+        lambda im: im.point(lambda p: 255 if p > THRESHOLD else 0, mode='1'),
+    ]
+    if img.mode != 'L':
+        steps.insert(0, ImageOps.grayscale)
+
+    current = img
+    for step in steps:
+        result = step(current)
+        estimate.add(_buffer_bytes(result))
+        # Intermediates are freed as soon as the next stage exists; the caller owns img
+        if current is not img:
+            current.close()
+            estimate.release(_buffer_bytes(current))
+        current = result
+    return current
+
+
+def _blank_rows(img, top, bottom):
+    """Rows in [top, bottom) of a binarised page that contain no ink"""
+    band = ImageOps.invert(img.crop((0, top, img.width, bottom)).convert('L'))
+    return [
+        top + y for y in range(bottom - top)
+        if band.crop((0, y, band.width, y + 1)).getbbox() is None
+    ]
+
+
+def _tile_boxes(img, tile_pixels=TILE_PIXELS, search_rows=TILE_SEARCH_ROWS):
+    """Split the page into full-width horizontal strips that don't overlap.
+
+    Each strip ends at the blank row closest to its nominal height, so no text line is cut
+    in half or read twice. A page with no blank row near the cut (a photo, say) is split
+    at the nominal height.
+    """
+    width, height = img.size
+    strip_height = max(tile_pixels // max(width, 1), 1)
+    boxes = []
+    top = 0
+    while top < height:
+        bottom = min(top + strip_height, height)
+        if bottom < height:
+            blank = _blank_rows(img, max(bottom - search_rows, top + 1), min(bottom + search_rows, height))
+            if blank:
+                bottom = min(blank, key=lambda y: abs(y - bottom))
+        boxes.append((0, top, width, bottom))
+        top = bottom
+    return boxes
+
+
+def ocr_image(file_path, max_workers=TILE_WORKERS):
+    """Run the bounded-memory OCR pipeline, returning (text, stats)"""
+    estimate = BufferEstimate()
+    img, stats = load_for_ocr(file_path, estimate=estimate)
+    try:
+        processed = preprocess(img, estimate)
+    finally:
+        estimate.release(_buffer_bytes(img))
+        img.close()
+
+    boxes = _tile_boxes(processed)
+    stats["tiles"] = len(boxes)
+
+    if len(boxes) == 1:
+        text = pytesseract.image_to_string(processed)
+    else:
+        def ocr_tile(box):
+            tile = processed.crop(box)
+            try:
+                return pytesseract.image_to_string(tile)
+            finally:
+                tile.close()
+
+        # At most max_workers tiles are cropped at once, alongside the preprocessed page
+        estimate.add(min(max_workers, len(boxes)) * max((b[2] - b[0]) * (b[3] - b[1]) for b in boxes))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            text = "\n".join(pool.map(ocr_tile, boxes))
+    processed.close()
+
+    stats["estimated_peak_bytes"] = estimate.peak
+    logging.info(f"OCR of {file_path}: {stats}")
+    return text, stats
@@ -0,0 +1,129 @@
+import logging, re, threading, time
+from collections import defaultdict, deque
+
+
+class ThinkStripper:
+    """Removes <think>...</think> sections from a token stream.
+
+    Tags may be split across chunks, so any trailing text that could be the start
+    of a tag is held back until the next chunk arrives.
+    """
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+        self.saw_open = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        out = []
+        while True:
+            tag = self.CLOSE if self._inside else self.OPEN
+            idx = self._buffer.find(tag)
+            if idx == -1:
+                keep = self._partial_tag_length(tag)
+                if not self._inside:
+                    out.append(self._buffer[:len(self._buffer) - keep])
+                self._buffer = self._buffer[len(self._buffer) - keep:]
+                break
+            if not self._inside:
+                out.append(self._buffer[:idx])
+                self.saw_open = True
+            self._buffer = self._buffer[idx + len(tag):]
+            self._inside = not self._inside
+        return "".join(out)
+
+    def flush(self):
+        rest = "" if self._inside else self._buffer
+        self._buffer = ""
+        return rest
+
+    def _partial_tag_length(self, tag):
+        for k in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+            if self._buffer.endswith(tag[:k]):
+                return k
+        return 0
+
+
+# deepseek-r1 sometimes omits <think> and only closes the reasoning block; the close tag then
+# sits on its own line early in the output. Anywhere else it is part of the answer.
+ORPHAN_CLOSE = re.compile(r"^[ \t]*</think>[ \t]*$", re.MULTILINE)
+ORPHAN_CLOSE_WINDOW = 8000
+
+
+def strip_think(text, saw_open=False):
+    """Non-streaming equivalent of ThinkStripper, also handling a missing opening tag.
+
+    Pass saw_open=True when the text already went through a ThinkStripper that removed
+    a complete block, so a literal </think> left in the answer is not mistaken for one.
+    """
+    stripper = ThinkStripper()
+    text = stripper.feed(text) + stripper.flush()
+    if not (saw_open or stripper.saw_open):
+        match = ORPHAN_CLOSE.search(text)
+        if match and match.start() <= ORPHAN_CLOSE_WINDOW:
+            text = text[match.end():]
+    return text.strip()
+
+
+class ModelRouter:
+    """Sends simple queries to a small fast model and escalates complex ones to the reasoning model"""
+    COMPLEX_PATTERNS = re.compile(
+        r"\b(why|explain|analy[sz]e|compare|prove|derive|step[- ]by[- ]step|reason|plan|design|"
+        r"debug|implement|code|algorithm|pros and cons|trade-?offs?)\b",
+        re.IGNORECASE
+    )
+
+    def __init__(self, fast_model, reasoning_model, max_simple_words=25, history_size=500):
+        self.fast_model = fast_model
+        self.reasoning_model = reasoning_model
+        self.max_simple_words = max_simple_words
+        self._lock = threading.Lock()
+        self._decisions = defaultdict(int)
+        self._latencies = defaultdict(lambda: deque(maxlen=history_size))
+
+    def route(self, question, context=""):
+        """Return (model, reason) for a question"""
+        if context.strip():
+            decision = (self.reasoning_model, "document_grounded")
+        elif len(question.split()) > self.max_simple_words:
+            decision = (self.reasoning_model, "long_query")
+        elif self.COMPLEX_PATTERNS.search(question):
+            decision = (self.reasoning_model, "complex_keywords")
+        else:
+            decision = (self.fast_model, "simple")
+        with self._lock:
+            self._decisions[decision] += 1
+        return decision
+
+    def fallback(self):
+        """Decision used when the fast model fails, counted so the stats show it"""
+        decision = (self.reasoning_model, "fast_model_failed")
+        with self._lock:
+            self._decisions[decision] += 1
+        return decision
+
+    def record(self, model, reason, started):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._latencies[model].append(elapsed)
+        logging.info(f"LLM routing: model={model} reason={reason} latency={elapsed:.2f}s")
+
+    def stats(self):
+        """Routing counts and latency percentiles per model, for tuning the thresholds"""
+        with self._lock:
+            decisions = {f"{model}:{reason}": count for (model, reason), count in self._decisions.items()}
+            latencies = {model: sorted(samples) for model, samples in self._latencies.items()}
+
+        models = {}
+        for model, samples in latencies.items():
+            if not samples:
+                continue
+            models[model] = {
+                "calls": len(samples),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                "p95_ms": round(samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000, 1),
+            }
+        return {"decisions": decisions, "latency": models, "max_simple_words": self.max_simple_words}
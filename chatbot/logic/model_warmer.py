@@ -0,0 +1,68 @@
+import os, logging, threading, time
+from datetime import datetime
+import requests
+
+
+def ollama_base_url():
+    """Same resolution as the Ollama client: OLLAMA_HOST, with or without a scheme"""
+    host = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
+    return host if host.startswith(("http://", "https://")) else f"http://{host}"
+
+
+class ModelWarmer:
+    """Keeps the configured Ollama models loaded during business hours.
+
+    An empty prompt to /api/generate loads a model without generating anything, and its
+    keep_alive resets the unload timer. Pinging more often than keep_alive expires means
+    the first chat after an idle spell never pays the model load. Outside business hours
+    the pings stop and Ollama unloads the models on its own.
+    """
+
+    def __init__(self, models, base_url=None, keep_alive="30m", interval_seconds=240,
+                 business_hours=(8, 20), weekdays=(0, 1, 2, 3, 4)):
+        self.models = list(models)
+        self.base_url = (base_url or ollama_base_url()).rstrip("/")
+        self.keep_alive = keep_alive
+        self.interval_seconds = interval_seconds
+        self.business_hours = business_hours
+        self.weekdays = set(weekdays)
+        self._stop = threading.Event()
+        self._session = requests.Session()
+
+    def in_business_hours(self, now=None):
+        now = now or datetime.now()
+        start, end = self.business_hours
+        return now.weekday() in self.weekdays and start <= now.hour < end
+
+    def ping(self, model):
+        """Load (or keep loaded) one model; returns how long Ollama took to answer"""
+        started = time.perf_counter()
+        response = self._session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": model, "prompt": "", "keep_alive": self.keep_alive, "stream": False},
+            timeout=300
+        )
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    def warm_all(self):
+        for model in self.models:
+            try:
+                elapsed = self.ping(model)
+                logging.debug(f"Warmed {model} in {elapsed:.2f}s")
+            except Exception as e:
+                logging.error(f"Model warm-up ping failed for {model}: {e}")
+
+    def start(self):
+        def loop():
+            while not self._stop.is_set():
+                if self.in_business_hours():
+                    self.warm_all()
+                self._stop.wait(self.interval_seconds)
+
+        thread = threading.Thread(target=loop, name="model-warmer", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,18 @@
+# Prompt layout is ordered for Ollama's prompt-prefix cache: everything that never changes
+# lives in the system prompt, chat history follows (append-only between the occasional
+# trims in ChatbotEngine._trim_memory), and only the per-turn context and question come
+# last. Keep the system prompt free of timestamps or other per-request values, or every
+# request pays a full prefill.
+
+SYSTEM_PROMPT = (
+    "You are Thara Chat, a helpful AI assistant. Provide concise, friendly responses.\n"
+    "Be conversational but informative, and use markdown formatting when helpful.\n"
+    "When context from the user's documents is provided, base your answer on it."
+)
+
+
+def human_message(question, context=""):
+    """The only per-turn part of the prompt: retrieved context first, then the question"""
+    if context:
+        return f"Context:\n{context}\n\nQuestion: {question}\n\nResponse:"
+    return f"Question: {question}\n\nResponse:"
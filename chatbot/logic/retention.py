@@ -0,0 +1,295 @@
+import os, json, gzip, logging, sqlite3, threading, time
+from contextlib import nullcontext
+from datetime import datetime
+import chromadb
+from .chunk_store import ChunkStore
+
+
+class RetentionPolicy:
+    """How long chat turns and documents are kept. None disables a limit."""
+
+    def __init__(self, chat_history_days=90, chat_history_max_rows=100_000,
+                 documents_days=None, summaries_days=30, archive=True, vacuum_pages=2000):
+        self.chat_history_days = chat_history_days
+        self.chat_history_max_rows = chat_history_max_rows
+        self.documents_days = documents_days
+        # Cached chunk summaries are only worth keeping while re-uploads are likely
+        self.summaries_days = summaries_days
+        self.archive = archive
+        self.vacuum_pages = vacuum_pages
+
+    @classmethod
+    def from_dict(cls, options):
+        return cls(**(options or {}))
+
+
+def _path_size(path):
+    if os.path.isfile(path):
+        # In WAL mode recent pages live in the -wal file until the next checkpoint
+        wal = f"{path}-wal"
+        return os.path.getsize(path) + (os.path.getsize(wal) if os.path.exists(wal) else 0)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class RetentionManager:
+    """Prunes, archives and compacts chat_history, documents and the Chroma collections"""
+    BATCH_SIZE = 1000
+    COLLECTION_PREFIX = "document_qna"
+
+    def __init__(self, db_path, chroma_path, archive_dir, policy=None, chroma_client=None, write_lock=None,
+                 owns_chroma=True):
+        self.db_path = db_path
+        self.chroma_path = chroma_path
+        # False when a Chroma server owns chroma_path; its files are then never touched from here
+        self.owns_chroma = owns_chroma
+        self.archive_dir = archive_dir
+        self.policy = policy or RetentionPolicy()
+        self.chroma_client = chroma_client
+        # Shared with the engine so pruning batches never interleave with chat writes
+        self.write_lock = write_lock or nullcontext()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self):
+        """Apply the policy once and return a report of what changed"""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                before = {
+                    "db_bytes": _path_size(self.db_path),
+                    "chroma_bytes": _path_size(self.chroma_path),
+                    "query_ms": self._measure_queries(conn),
+                }
+                report = {
+                    "chat_rows_archived": self._prune_chat_history(conn),
+                    "documents_removed": self._prune_documents(conn),
+                    "orphaned_chunks_removed": self._delete_orphaned_chunks(conn),
+                    "summaries_removed": self._prune_summaries(conn),
+                    "orphaned_vectors_removed": self._delete_orphaned_vectors(conn),
+                }
+                self._compact(conn)
+                self._compact_chroma()
+                after = {
+                    "db_bytes": _path_size(self.db_path),
+                    "chroma_bytes": _path_size(self.chroma_path),
+                    "query_ms": self._measure_queries(conn),
+                }
+            finally:
+                conn.close()
+
+        report["before"] = before
+        report["after"] = after
+        report["reclaimed_bytes"] = (
+            before["db_bytes"] + before["chroma_bytes"] - after["db_bytes"] - after["chroma_bytes"]
+        )
+        logging.info(f"Retention run complete: {report}")
+        return report
+
+    def start(self, interval_seconds):
+        """Run the policy periodically on a daemon thread"""
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.run()
+                except Exception as e:
+                    logging.error(f"Scheduled retention run failed: {e}")
+
+        thread = threading.Thread(target=loop, name="retention", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def _archive(self, table, columns, rows):
+        if not self.policy.archive or not rows:
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        segment = os.path.join(
+            self.archive_dir, f"{table}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl.gz"
+        )
+        with gzip.open(segment, "wt", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+
+    def _chat_history_cutoff(self):
+        """WHERE clause selecting chat turns outside the age or row-count limits"""
+        clauses, params = [], []
+        if self.policy.chat_history_days is not None:
+            clauses.append("timestamp < datetime('now', ?)")
+            params.append(f"-{self.policy.chat_history_days} days")
+        if self.policy.chat_history_max_rows is not None:
+            clauses.append("id <= (SELECT id FROM chat_history ORDER BY id DESC LIMIT 1 OFFSET ?)")
+            params.append(self.policy.chat_history_max_rows)
+        if not clauses:
+            return None, []
+        return " OR ".join(clauses), params
+
+    def _prune_chat_history(self, conn):
+        where, params = self._chat_history_cutoff()
+        if where is None:
+            return 0
+
+        cursor = conn.execute("SELECT * FROM chat_history LIMIT 0")
+        columns = [d[0] for d in cursor.description]
+        removed = 0
+        while True:
+            # Oldest first, in fixed-size batches so memory stays flat however large the backlog
+            rows = conn.execute(
+                f"SELECT * FROM chat_history WHERE {where} ORDER BY id LIMIT ?",
+                (*params, self.BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            self._archive("chat_history", columns, rows)
+            with self.write_lock:
+                conn.executemany("DELETE FROM chat_history WHERE id = ?", [(row[0],) for row in rows])
+                conn.commit()
+            removed += len(rows)
+        return removed
+
+    def _prune_documents(self, conn):
+        if self.policy.documents_days is None:
+            return 0
+        with self.write_lock:
+            cursor = conn.execute(
+                "DELETE FROM documents WHERE timestamp < datetime('now', ?)",
+                (f"-{self.policy.documents_days} days",)
+            )
+            conn.commit()
+        # Their vectors are picked up as orphans in the next step
+        return cursor.rowcount
+
+    def _delete_orphaned_chunks(self, conn):
+        with self.write_lock:
+            removed = ChunkStore(conn).delete_orphans()
+            conn.commit()
+        return removed
+
+    def _prune_summaries(self, conn):
+        """Expire cached chunk summaries by age and drop summaries of deleted documents"""
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        removed = 0
+        if "chunk_summaries" in tables and self.policy.summaries_days is not None:
+            while True:
+                with self.write_lock:
+                    deleted = conn.execute(
+                        "DELETE FROM chunk_summaries WHERE rowid IN (SELECT rowid FROM chunk_summaries "
+                        "WHERE timestamp < datetime('now', ?) LIMIT ?)",
+                        (f"-{self.policy.summaries_days} days", self.BATCH_SIZE)
+                    ).rowcount
+                    conn.commit()
+                removed += deleted
+                if deleted < self.BATCH_SIZE:
+                    break
+        if "document_summaries" in tables:
+            with self.write_lock:
+                removed += conn.execute(
+                    "DELETE FROM document_summaries WHERE embedding_id NOT IN (SELECT embedding_id FROM documents)"
+                ).rowcount
+                conn.commit()
+        return removed
+
+    def _collections(self):
+        if self.chroma_client is None:
+            self.chroma_client = chromadb.PersistentClient(path=self.chroma_path)
+        for entry in self.chroma_client.list_collections():
+            name = entry if isinstance(entry, str) else entry.name
+            if name.startswith(self.COLLECTION_PREFIX):
+                yield self.chroma_client.get_collection(name)
+
+    def _delete_orphaned_vectors(self, conn):
+        """Remove chunks whose parent embedding_id no longer exists in documents"""
+        live = {row[0] for row in conn.execute("SELECT embedding_id FROM documents")}
+        removed = 0
+        for collection in self._collections():
+            offset = 0
+            while True:
+                page = collection.get(limit=self.BATCH_SIZE, offset=offset, include=["metadatas"])
+                if not page["ids"]:
+                    break
+                orphans = [
+                    chunk_id for chunk_id, meta in zip(page["ids"], page["metadatas"])
+                    # Vectors stored before chunking used the document id as their own id
+                    if (meta or {}).get("embedding_id", chunk_id) not in live
+                ]
+                # live was read before the scan; a document uploaded since then commits its row
+                # before upserting vectors, so re-checking here keeps its new vectors
+                orphans = self._still_orphaned(conn, page, orphans)
+                if orphans:
+                    collection.delete(ids=orphans)
+                    removed += len(orphans)
+                offset += len(page["ids"]) - len(orphans)
+        return removed
+
+    def _still_orphaned(self, conn, page, candidates):
+        if not candidates:
+            return candidates
+        parents = {
+            chunk_id: (meta or {}).get("embedding_id", chunk_id)
+            for chunk_id, meta in zip(page["ids"], page["metadatas"])
+        }
+        wanted = sorted({parents[chunk_id] for chunk_id in candidates})
+        placeholders = ",".join("?" * len(wanted))
+        live = {row[0] for row in conn.execute(
+            f"SELECT embedding_id FROM documents WHERE embedding_id IN ({placeholders})", wanted
+        )}
+        return [chunk_id for chunk_id in candidates if parents[chunk_id] not in live]
+
+    def _compact(self, conn):
+        """Release free pages incrementally instead of rewriting the whole file each run"""
+        with self.write_lock:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Switching an existing database to incremental mode needs one full VACUUM
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+            # execute() steps a statement only once, which frees a single page; executescript
+            # runs incremental_vacuum to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(self.policy.vacuum_pages)});")
+            conn.execute("PRAGMA optimize")
+            conn.commit()
+            # Checkpoint so the vacuumed pages reach the main file before sizes are measured
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def _compact_chroma(self):
+        """VACUUM Chroma's SQLite file once deleted vectors have left free pages in it.
+
+        Only the SQLite file can shrink: the HNSW index files beside it keep the slots of
+        deleted vectors and reuse them for later inserts, so they stay at their high-water mark.
+        """
+        path = os.path.join(self.chroma_path, "chroma.sqlite3")
+        if not self.owns_chroma or not os.path.isfile(path):
+            return
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            if conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                conn.execute("VACUUM")
+        except sqlite3.OperationalError as e:
+            # An open Chroma client holding a transaction; the next run tries again
+            logging.warning(f"Could not compact {path}: {e}")
+        finally:
+            conn.close()
+
+    def _measure_queries(self, conn, repeat=20):
+        """Latency of the lookups the engine runs on every chat turn, for its most recent owner"""
+        row = conn.execute("SELECT owner FROM chat_history ORDER BY id DESC LIMIT 1").fetchone()
+        owner = row[0] if row else "anonymous"
+        statements = [
+            ("SELECT user_query FROM chat_history WHERE owner = ? ORDER BY id DESC LIMIT 1", (owner,)),
+            ("SELECT bot_response FROM chat_history WHERE user_query = ? AND owner = ? "
+             "ORDER BY timestamp DESC LIMIT 1", ("hello", owner)),
+            ("SELECT id, user_query, bot_response, timestamp FROM chat_history "
+             "WHERE owner = ? ORDER BY id DESC LIMIT ?", (owner, 51)),
+        ]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for sql, params in statements:
+                conn.execute(sql, params).fetchall()
+        return round((time.perf_counter() - start) * 1000 / repeat, 3)
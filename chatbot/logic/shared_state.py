@@ -0,0 +1,93 @@
+import os, json, logging, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only, so a thread lock is enough
+    fcntl = None
+
+
+class SQLiteWriteLock:
+    """Serialises SQLite writes across threads and, via flock on a sidecar file, across worker processes"""
+
+    def __init__(self, db_path):
+        self.lock_path = f"{db_path}.lock"
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            # File descriptors inherited across fork share the lock, so each process opens its own
+            if self._pid != os.getpid():
+                self._fd = open(self.lock_path, "a+")
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+        return False
+
+
+class RemoteEmbeddings:
+    """Drop-in for FastEmbedEmbeddings that calls the shared local embedding service"""
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _embed(self, texts, query):
+        response = self._session.post(
+            f"{self.url}/embed", json={"texts": texts, "query": query}, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), query=False)
+
+    def embed_query(self, text):
+        return self._embed([text], query=True)[0]
+
+    def embed_queries(self, texts):
+        return self._embed(list(texts), query=True)
+
+
+def serve_embeddings(embedding_model, host="127.0.0.1", port=8765):
+    """Serve one embedding model to every worker process over local HTTP"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/embed":
+                self.send_error(404)
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = payload["texts"]
+                if payload.get("query"):
+                    embeddings = embedding_model.embed_queries(texts)
+                else:
+                    embeddings = embedding_model.embed_documents(texts)
+                body = json.dumps({"embeddings": [list(map(float, e)) for e in embeddings]}).encode()
+            except Exception as e:
+                logging.error(f"Embedding request failed: {e}")
+                self.send_error(500, str(e))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logging.info(f"Embedding service listening on http://{host}:{port}")
+    server.serve_forever()
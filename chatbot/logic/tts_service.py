@@ -0,0 +1,135 @@
+import os, hashlib, logging, queue, threading
+from concurrent.futures import Future
+import pyttsx3
+
+
+class SpeechRenderer:
+    """Renders text to audio files on a dedicated worker thread with a size-bounded disk cache.
+
+    pyttsx3 is not thread-safe, so the engine is created and driven exclusively by the
+    worker thread; request threads only enqueue jobs and wait on a Future.
+    """
+    AUDIO_EXT = '.wav'
+    PINNED_PREFIX = 'p_'
+    # Synthesis is serialized on one worker, so a single huge request would stall every other one
+    MAX_TEXT_CHARS = 5000
+
+    def __init__(self, cache_dir, max_cache_bytes=200 * 1024 * 1024, default_rate=175):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.default_rate = default_rate
+        self.voices = []
+        self.available = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._jobs = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._worker.start()
+        self._ready.wait(timeout=10)
+
+    def cache_filename(self, text, voice=0, rate=None, pinned=False):
+        """Cache entries are keyed by (text hash, voice, rate)"""
+        rate = rate or self.default_rate
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        prefix = self.PINNED_PREFIX if pinned else ''
+        return f"{prefix}{digest}_v{voice}_r{rate}{self.AUDIO_EXT}"
+
+    def lookup(self, text, voice=0, rate=None, pinned=False):
+        """Return the cached filename for this text, or None if it hasn't been rendered yet"""
+        filename = self.cache_filename(text, voice, rate, pinned)
+        path = os.path.join(self.cache_dir, filename)
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # Refresh mtime so eviction is least-recently-used
+            except OSError:
+                pass
+            return filename
+        return None
+
+    def render(self, text, voice=0, rate=None, pinned=False, timeout=60):
+        """Return (filename, cached) for the rendered audio, synthesizing it if necessary"""
+        if len(text) > self.MAX_TEXT_CHARS:
+            raise ValueError(f"Text is too long to read aloud (limit {self.MAX_TEXT_CHARS} characters)")
+        rate = rate or self.default_rate
+        filename = self.lookup(text, voice, rate, pinned)
+        if filename:
+            return filename, True
+        if not self.available:
+            raise RuntimeError("Text-to-speech engine is not available")
+        if self.voices and not 0 <= voice < len(self.voices):
+            raise ValueError(f"Unknown voice index: {voice}")
+
+        filename = self.cache_filename(text, voice, rate, pinned)
+        with self._lock:
+            # Concurrent requests for the same audio share one synthesis job
+            future = self._pending.get(filename)
+            if future is None:
+                future = Future()
+                self._pending[filename] = future
+                self._jobs.put((filename, text, voice, rate, future))
+        return future.result(timeout=timeout), False
+
+    def shutdown(self):
+        self._jobs.put(None)
+
+    def _run(self):
+        try:
+            engine = pyttsx3.init()
+            self.voices = engine.getProperty('voices') or []
+            self.available = True
+        except Exception as e:
+            logging.error(f"TTS Init Error: {e}")
+            engine = None
+        finally:
+            self._ready.set()
+
+        while engine is not None:
+            job = self._jobs.get()
+            if job is None:
+                break
+            filename, text, voice, rate, future = job
+            final_path = os.path.join(self.cache_dir, filename)
+            tmp_path = f"{final_path}.{threading.get_ident()}.tmp{self.AUDIO_EXT}"
+            try:
+                if self.voices:
+                    engine.setProperty('voice', self.voices[voice].id)
+                engine.setProperty('rate', rate)
+                engine.save_to_file(text, tmp_path)
+                engine.runAndWait()
+                os.replace(tmp_path, final_path)
+                self._evict()
+                future.set_result(filename)
+            except Exception as e:
+                logging.error(f"TTS render failed: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(filename, None)
+
+    def _evict(self):
+        """Drop least-recently-used unpinned entries until the cache fits its size budget"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or not entry.name.endswith(self.AUDIO_EXT):
+                continue
+            stat = entry.stat()
+            total += stat.st_size
+            if not entry.name.startswith(self.PINNED_PREFIX):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        if total <= self.max_cache_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                logging.error(f"TTS cache eviction failed for {path}: {e}")
+            if total <= self.max_cache_bytes:
+                break
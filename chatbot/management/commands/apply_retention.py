@@ -0,0 +1,59 @@
+import os
+import chromadb
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chatbot.logic.chatbot_engine import ChatbotEngine
+from chatbot.logic.retention import RetentionManager, RetentionPolicy
+from chatbot.logic.shared_state import SQLiteWriteLock
+
+
+class Command(BaseCommand):
+    help = "Prune, archive and compact chat history, documents and the vector store"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chat-days", type=int, help="Override chat_history_days")
+        parser.add_argument("--chat-max-rows", type=int, help="Override chat_history_max_rows")
+        parser.add_argument("--document-days", type=int, help="Override documents_days")
+        parser.add_argument("--no-archive", action="store_true", help="Delete without writing JSONL archives")
+
+    def handle(self, *args, **options):
+        policy = RetentionPolicy.from_dict(getattr(settings, "CHATBOT_RETENTION", None))
+        if options["chat_days"] is not None:
+            policy.chat_history_days = options["chat_days"]
+        if options["chat_max_rows"] is not None:
+            policy.chat_history_max_rows = options["chat_max_rows"]
+        if options["document_days"] is not None:
+            policy.documents_days = options["document_days"]
+        if options["no_archive"]:
+            policy.archive = False
+
+        # With a Chroma server the directory belongs to it; opening it embedded as well would
+        # put a second writer on the same files
+        chroma_host = getattr(settings, "CHATBOT_CHROMA_HOST", None)
+        chroma_client = None
+        if chroma_host:
+            chroma_client = chromadb.HttpClient(
+                host=chroma_host, port=getattr(settings, "CHATBOT_CHROMA_PORT", 8000)
+            )
+
+        manager = RetentionManager(
+            db_path=ChatbotEngine.DB_PATH,
+            chroma_path=ChatbotEngine.CHROMA_PATH,
+            archive_dir=getattr(settings, "CHATBOT_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, 'archive')),
+            policy=policy,
+            chroma_client=chroma_client,
+            write_lock=SQLiteWriteLock(ChatbotEngine.DB_PATH),
+            owns_chroma=not chroma_host
+        )
+        report = manager.run()
+
+        before, after = report["before"], report["after"]
+        self.stdout.write(f"Chat turns archived/removed: {report['chat_rows_archived']:,}")
+        self.stdout.write(f"Documents removed:           {report['documents_removed']:,}")
+        self.stdout.write(f"Orphaned chunks removed:     {report['orphaned_chunks_removed']:,}")
+        self.stdout.write(f"Summaries removed:           {report['summaries_removed']:,}")
+        self.stdout.write(f"Orphaned vectors removed:    {report['orphaned_vectors_removed']:,}")
+        self.stdout.write(f"SQLite size:  {before['db_bytes']:,} -> {after['db_bytes']:,} bytes")
+        self.stdout.write(f"Chroma size:  {before['chroma_bytes']:,} -> {after['chroma_bytes']:,} bytes")
+        self.stdout.write(f"Lookup time:  {before['query_ms']} -> {after['query_ms']} ms per chat turn")
+        self.stdout.write(self.style.SUCCESS(f"Reclaimed {report['reclaimed_bytes']:,} bytes"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from langchain_community.embeddings import FastEmbedEmbeddings
+from chatbot.logic.shared_state import serve_embeddings
+from chatbot.logic.embedding_batcher import EmbeddingBatcher
+
+
+class Command(BaseCommand):
+    help = "Serve the FastEmbed model to all web workers over local HTTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--max-wait-ms", type=float, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Loading embedding model, serving on {options['host']}:{options['port']}")
+        # Queries from every worker are coalesced into shared batches
+        model = EmbeddingBatcher(
+            FastEmbedEmbeddings(), max_batch=options["batch_size"], max_wait_ms=options["max_wait_ms"]
+        )
+        serve_embeddings(model, host=options["host"], port=options["port"])
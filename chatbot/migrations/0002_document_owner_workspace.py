@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="owner",
+            field=models.CharField(default="anonymous", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="workspace",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["owner", "workspace"], name="chatbot_doc_owner_ws_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("chatbot", "0002_document_owner_workspace"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chathistory",
+            name="owner",
+            field=models.CharField(default="anonymous", max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name="chathistory",
+            index=models.Index(fields=["owner", "id"], name="chatbot_chat_owner_id_idx"),
+        ),
+    ]
@@ -11,8 +11,12 @@ class CustomUser(AbstractUser):
 class ChatHistory(models.Model):
     user_query = models.TextField()
     bot_response = models.TextField()
+    owner = models.CharField(max_length=255, default="anonymous")
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["owner", "id"], name="chatbot_chat_owner_id_idx")]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.user_query[:50]}..."
 
@@ -21,7 +25,12 @@ class Document(models.Model):
     filename = models.CharField(max_length=255)
     content = models.TextField()
     embedding_id = models.CharField(max_length=255, unique=True)
+    owner = models.CharField(max_length=255, default="anonymous")
+    workspace = models.CharField(max_length=255, blank=True, default="")
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["owner", "workspace"], name="chatbot_doc_owner_ws_idx")]
+
     def __str__(self):
         return f"{self.filename} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
@@ -1,3 +1,627 @@
-from django.test import TestCase
+import gzip, os, shutil, sqlite3, tempfile, threading, time, zlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from PIL import Image, ImageDraw
+from .logic.chatbot_engine import ChatbotEngine
+from .logic.chunk_store import ChunkStore
+from .logic.document_analysis import DocumentAnalyzer
+from .logic.embedding_batcher import EmbeddingBatcher
+from .logic.image_processing import ImageTooLargeError, _tile_boxes, load_for_ocr, preprocess
+from .logic.model_router import ModelRouter, ThinkStripper, strip_think
+from .logic.retention import RetentionManager, RetentionPolicy
+from .logic.shared_state import SQLiteWriteLock
+from .logic.tts_service import SpeechRenderer
 
-# Create your tests here.
+
+def make_chat_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_query TEXT,
+            bot_response TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            owner TEXT DEFAULT 'anonymous'
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO chat_history (user_query, bot_response) VALUES (?, ?)",
+        [(f"question {i}", "answer " * 50) for i in range(rows)]
+    )
+    conn.commit()
+    return conn
+
+
+class TempDirMixin:
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+
+class FakeCollection:
+    """Just enough of a Chroma collection for paging through metadata and deleting"""
+
+    def __init__(self, name, vectors, on_first_page=None):
+        self.name = name
+        self.vectors = dict(vectors)
+        self.on_first_page = on_first_page
+
+    def get(self, limit, offset, include):
+        if self.on_first_page:
+            self.on_first_page()
+            self.on_first_page = None
+        ids = sorted(self.vectors)[offset:offset + limit]
+        return {"ids": ids, "metadatas": [{"embedding_id": self.vectors[i]} for i in ids]}
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            del self.vectors[chunk_id]
+
+
+class FakeChromaClient:
+    def __init__(self, *collections):
+        self.collections = {c.name: c for c in collections}
+
+    def list_collections(self):
+        return list(self.collections)
+
+    def get_collection(self, name):
+        return self.collections[name]
+
+
+class RetentionTests(TempDirMixin, SimpleTestCase):
+    def manager(self, **policy):
+        return RetentionManager(
+            os.path.join(self.tmp, "chat.db"), os.path.join(self.tmp, "chroma"),
+            os.path.join(self.tmp, "archive"), RetentionPolicy(**policy)
+        )
+
+    def test_chat_history_pruned_in_batches_oldest_first(self):
+        conn = make_chat_db(os.path.join(self.tmp, "chat.db"), 50)
+        manager = self.manager(chat_history_days=None, chat_history_max_rows=20)
+        manager.BATCH_SIZE = 7
+
+        self.assertEqual(manager._prune_chat_history(conn), 30)
+        ids = [row[0] for row in conn.execute("SELECT id FROM chat_history ORDER BY id")]
+        self.assertEqual(ids, list(range(31, 51)))
+
+        archived = []
+        for name in os.listdir(manager.archive_dir):
+            with gzip.open(os.path.join(manager.archive_dir, name), "rt") as f:
+                archived += f.readlines()
+        self.assertEqual(len(archived), 30)
+
+    def test_no_limits_prunes_nothing(self):
+        conn = make_chat_db(os.path.join(self.tmp, "chat.db"), 5)
+        manager = self.manager(chat_history_days=None, chat_history_max_rows=None)
+        self.assertEqual(manager._chat_history_cutoff(), (None, []))
+        self.assertEqual(manager._prune_chat_history(conn), 0)
+
+    def test_summaries_expire_and_follow_their_documents(self):
+        conn = make_chat_db(os.path.join(self.tmp, "chat.db"), 0)
+        conn.execute("CREATE TABLE documents (embedding_id TEXT)")
+        conn.execute("INSERT INTO documents VALUES ('doc_live')")
+        DocumentAnalyzer(conn, threading.Lock(), None, None)
+        conn.executemany(
+            "INSERT INTO chunk_summaries (content_hash, summary, timestamp) VALUES (?, 's', datetime('now', ?))",
+            [(f"old{i}", "-40 days") for i in range(15)] + [("fresh", "-1 days")]
+        )
+        conn.executemany(
+            "INSERT INTO document_summaries (embedding_id, summary) VALUES (?, 's')", [("doc_live",), ("doc_gone",)]
+        )
+        manager = self.manager(summaries_days=30)
+        manager.BATCH_SIZE = 4
+
+        self.assertEqual(manager._prune_summaries(conn), 16)
+        self.assertEqual(conn.execute("SELECT content_hash FROM chunk_summaries").fetchall(), [("fresh",)])
+        self.assertEqual(conn.execute("SELECT embedding_id FROM document_summaries").fetchall(), [("doc_live",)])
+
+    def test_vectors_of_documents_uploaded_during_the_scan_are_kept(self):
+        conn = make_chat_db(os.path.join(self.tmp, "chat.db"), 0)
+        conn.execute("CREATE TABLE documents (embedding_id TEXT)")
+        conn.execute("INSERT INTO documents VALUES ('doc_live')")
+        conn.commit()
+
+        def upload():
+            # _store_document commits the documents row, then upserts the vectors
+            conn.execute("INSERT INTO documents VALUES ('doc_new')")
+            conn.commit()
+
+        collection = FakeCollection("document_qna", {
+            "doc_live_0": "doc_live", "doc_gone_0": "doc_gone", "doc_gone_1": "doc_gone",
+            "doc_new_0": "doc_new", "doc_new_1": "doc_new",
+        }, on_first_page=upload)
+        manager = self.manager()
+        manager.chroma_client = FakeChromaClient(collection)
+        manager.BATCH_SIZE = 2
+
+        self.assertEqual(manager._delete_orphaned_vectors(conn), 2)
+        self.assertEqual(sorted(collection.vectors), ["doc_live_0", "doc_new_0", "doc_new_1"])
+
+    def test_incremental_vacuum_drains_free_pages(self):
+        conn = make_chat_db(os.path.join(self.tmp, "chat.db"), 5000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        manager = self.manager(vacuum_pages=100_000)
+        # First run switches the database to incremental mode with a full VACUUM
+        manager._compact(conn)
+        self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+        conn.execute("DELETE FROM chat_history")
+        conn.commit()
+        self.assertGreater(conn.execute("PRAGMA freelist_count").fetchone()[0], 1)
+        manager._compact(conn)
+        self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+
+    def chroma_sqlite_with_free_pages(self):
+        os.makedirs(os.path.join(self.tmp, "chroma"))
+        path = os.path.join(self.tmp, "chroma", "chroma.sqlite3")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE embeddings (id INTEGER PRIMARY KEY, blob TEXT)")
+        conn.executemany("INSERT INTO embeddings (blob) VALUES (?)", [("x" * 500,)] * 2000)
+        conn.commit()
+        conn.execute("DELETE FROM embeddings")
+        conn.commit()
+        conn.close()
+        return path
+
+    def test_chroma_sqlite_compacted_when_owned(self):
+        path = self.chroma_sqlite_with_free_pages()
+        size = os.path.getsize(path)
+        self.manager()._compact_chroma()
+        self.assertLess(os.path.getsize(path), size / 10)
+
+    def test_chroma_server_files_left_alone(self):
+        path = self.chroma_sqlite_with_free_pages()
+        size = os.path.getsize(path)
+        manager = self.manager()
+        manager.owns_chroma = False
+        manager._compact_chroma()
+        self.assertEqual(os.path.getsize(path), size)
+
+
+class ThinkStripperTests(SimpleTestCase):
+    def stream(self, chunks):
+        stripper = ThinkStripper()
+        return "".join(stripper.feed(c) for c in chunks) + stripper.flush(), stripper
+
+    def test_block_removed_when_tags_split_across_chunks(self):
+        text, stripper = self.stream(["Hi <th", "ink>secret reas", "oning</thi", "nk> there"])
+        self.assertEqual(text, "Hi  there")
+        self.assertTrue(stripper.saw_open)
+
+    def test_partial_tag_prefix_is_released_at_the_end(self):
+        text, _ = self.stream(["a < b and x <thi"])
+        self.assertEqual(text, "a < b and x <thi")
+
+    def test_unclosed_block_is_dropped(self):
+        text, _ = self.stream(["Answer<think>never closed"])
+        self.assertEqual(text, "Answer")
+
+    def test_strip_think_handles_orphan_close_tag(self):
+        self.assertEqual(strip_think("Let me think...\n</think>\n\nParis."), "Paris.")
+
+    def test_strip_think_keeps_literal_close_tag_in_answer(self):
+        self.assertEqual(strip_think("Use the </think> tag"), "Use the </think> tag")
+        self.assertEqual(strip_think("<think>x</think>Close it with\n</think>\n"), "Close it with\n</think>")
+        self.assertEqual(strip_think("Close it with\n</think>", saw_open=True), "Close it with\n</think>")
+
+
+class ModelRouterTests(SimpleTestCase):
+    def test_routing_decisions(self):
+        router = ModelRouter("fast", "reasoning")
+        self.assertEqual(router.route("what is the capital of France"), ("fast", "simple"))
+        self.assertEqual(router.route("explain recursion"), ("reasoning", "complex_keywords"))
+        self.assertEqual(router.route("when is it due", "invoice due 1 May"), ("reasoning", "document_grounded"))
+        self.assertEqual(router.stats()["decisions"]["fast:simple"], 1)
+
+
+class MissingModelChain:
+    """An Ollama model that was never pulled"""
+
+    def stream(self, inputs):
+        raise ConnectionError('model "llama3.2:3b" not found, try pulling it first')
+
+    def invoke(self, prompt):
+        raise ConnectionError('model "llama3.2:3b" not found, try pulling it first')
+
+
+class StubChain:
+    def stream(self, inputs):
+        yield from ["<think>plan</think>", "Paris is ", "the capital."]
+
+
+class FastModelFallbackTests(SimpleTestCase):
+    def test_simple_query_falls_back_to_reasoning_model(self):
+        bot = ChatbotEngine.__new__(ChatbotEngine)
+        bot.shared_memory = False
+        bot.initialize_memory()
+        bot.reasoning_model = "reasoning"
+        bot.router = ModelRouter("fast", "reasoning")
+        bot.llm_chains = {"fast": MissingModelChain(), "reasoning": StubChain()}
+
+        self.assertEqual(bot._generate_response("capital of France?"), "Paris is the capital.")
+        self.assertEqual(bot.router.stats()["decisions"]["reasoning:fast_model_failed"], 1)
+
+    def test_reasoning_model_failure_is_not_retried(self):
+        bot = ChatbotEngine.__new__(ChatbotEngine)
+        bot.shared_memory = False
+        bot.initialize_memory()
+        bot.reasoning_model = "reasoning"
+        bot.router = ModelRouter("fast", "reasoning")
+        bot.llm_chains = {"fast": StubChain(), "reasoning": MissingModelChain()}
+        with self.assertRaises(ConnectionError):
+            bot._generate_response("explain recursion")
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.calls += 1
+        return f"<think>hmm</think>summary of {len(prompt)} chars"
+
+
+class DocumentAnalyzerTests(SimpleTestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.llm = CountingLLM()
+        self.analyzer = DocumentAnalyzer(self.conn, threading.Lock(), self.llm, self.llm)
+        self.analyzer.CHUNK_CHARS = 100
+
+    def test_split_respects_paragraphs_and_chunk_size(self):
+        text = "\n".join(["a" * 40] * 5 + ["b" * 250])
+        chunks = self.analyzer.split(text)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertEqual(chunks[0], "\n".join(["a" * 40] * 2))
+        self.assertEqual("".join(chunks).replace("\n", ""), text.replace("\n", ""))
+
+    def test_summaries_fall_back_to_final_model(self):
+        analyzer = DocumentAnalyzer(self.conn, threading.Lock(), MissingModelChain(), self.llm)
+        self.assertTrue(analyzer._summarize("text", analyzer.MAP_PROMPT).startswith("summary of"))
+        self.assertEqual(self.llm.calls, 1)
+
+    def test_split_of_blank_text_is_empty(self):
+        self.assertEqual(self.analyzer.split("\n\n  "), [])
+
+    def test_summaries_cached_and_kept_per_document(self):
+        text = "\n".join(f"paragraph {i} " * 5 for i in range(20))
+        first = self.analyzer.analyze(text, document_id="doc_1")
+        calls = self.llm.calls
+        self.assertNotIn("<think>", first)
+
+        # Only the final write-up runs again; every chunk and combined summary is cached
+        self.analyzer.analyze(text)
+        self.assertEqual(self.llm.calls, calls + 1)
+        self.assertEqual(list(self.analyzer.summaries_for(["doc_1", "doc_2"])), ["doc_1"])
+
+
+class ChunkStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.execute("CREATE TABLE documents (embedding_id TEXT)")
+        self.store = ChunkStore(self.conn)
+
+    def test_get_returns_only_requested_chunks(self):
+        self.store.put("doc_a", ["first", "second", "third ✓"])
+        self.assertEqual(
+            self.store.get([("doc_a", 2), ("doc_a", 0), ("doc_b", 0)]),
+            {("doc_a", 2): "third ✓", ("doc_a", 0): "first"}
+        )
+        self.assertEqual(self.store.get([]), {})
+
+    def test_put_replaces_previous_chunks(self):
+        self.store.put("doc_a", ["one", "two", "three"])
+        self.store.put("doc_a", ["uno"])
+        self.assertEqual(self.store.get([("doc_a", i) for i in range(3)]), {("doc_a", 0): "uno"})
+
+    def test_zlib_frames_stay_readable(self):
+        self.conn.execute(
+            "INSERT INTO document_chunks VALUES (?, ?, 'zlib', ?)", ("doc_old", 0, zlib.compress(b"legacy"))
+        )
+        self.assertEqual(self.store.get([("doc_old", 0)]), {("doc_old", 0): "legacy"})
+
+    def test_delete_orphans_keeps_live_documents(self):
+        self.conn.execute("INSERT INTO documents VALUES ('doc_live')")
+        self.store.put("doc_live", ["kept"])
+        self.store.put("doc_gone", ["dropped", "dropped too"])
+        self.assertEqual(self.store.delete_orphans(), 2)
+        self.assertEqual(self.store.get([("doc_live", 0)]), {("doc_live", 0): "kept"})
+
+    def test_concurrent_compression_round_trips(self):
+        texts = [f"chunk {i} " * 200 for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            frames = list(pool.map(self.store._compress, texts))
+            decoded = list(pool.map(lambda frame: self.store._decompress(self.store.codec, frame), frames))
+        self.assertEqual(decoded, texts)
+
+
+class QueryOnlyEmbeddings:
+    """Asymmetric model: queries and passages must never be mixed up"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_queries(self, texts):
+        self.calls += 1
+        return [[1.0, float(len(text))] for text in texts]
+
+    def embed_documents(self, texts):
+        raise AssertionError("queries must not be embedded as documents")
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+    def test_concurrent_queries_use_the_query_path(self):
+        batcher = EmbeddingBatcher(QueryOnlyEmbeddings(), max_batch=8, max_wait_ms=20)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            vectors = list(pool.map(batcher.embed_query, ["a" * n for n in range(1, 17)]))
+        self.assertEqual(vectors, [[1.0, float(n)] for n in range(1, 17)])
+        self.assertLess(batcher.stats()["batches"], 16)
+
+    def test_one_request_of_many_queries_is_one_model_call(self):
+        embeddings = QueryOnlyEmbeddings()
+        batcher = EmbeddingBatcher(embeddings, max_batch=32, max_wait_ms=50)
+        vectors = batcher.embed_queries(["a" * n for n in range(1, 21)])
+        self.assertEqual(vectors, [[1.0, float(n)] for n in range(1, 21)])
+        self.assertEqual(embeddings.calls, 1)
+        self.assertEqual(batcher.stats()["items"], 20)
+
+    def test_missing_vectors_fail_instead_of_hanging(self):
+        embeddings = QueryOnlyEmbeddings()
+        embeddings.embed_queries = lambda texts: []
+        batcher = EmbeddingBatcher(embeddings, timeout=5)
+        with self.assertRaises(RuntimeError):
+            batcher.embed_query("lost")
+
+
+class ChatHistoryPaginationTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        # Only the SQLite side of the engine is needed; skip loading models and Chroma
+        self.bot = ChatbotEngine.__new__(ChatbotEngine)
+        self.bot.DB_PATH = os.path.join(self.tmp, "chat.db")
+        self.bot.conn = make_chat_db(self.bot.DB_PATH, 0)
+        self.bot.cursor = self.bot.conn.cursor()
+        self.bot.conn.executemany(
+            "INSERT INTO chat_history (user_query, bot_response, owner) VALUES (?, 'a', ?)",
+            [(f"q{i}", "alice" if i % 3 else "bob") for i in range(30)]
+        )
+        self.bot.conn.commit()
+        self.alice_ids = [row[0] for row in self.bot.conn.execute(
+            "SELECT id FROM chat_history WHERE owner = 'alice' ORDER BY id DESC"
+        )]
+
+    def test_pages_walk_newest_first_without_gaps_or_overlap(self):
+        seen, before, pages = [], None, 0
+        while True:
+            rows, before = self.bot.history_page("alice", before=before, limit=7)
+            seen += [row[0] for row in rows]
+            pages += 1
+            if before is None:
+                break
+        self.assertEqual(seen, self.alice_ids)
+        self.assertEqual(pages, 3)
+
+    def test_exact_multiple_has_no_empty_trailing_page(self):
+        rows, cursor = self.bot.history_page("alice", limit=len(self.alice_ids))
+        self.assertEqual(len(rows), len(self.alice_ids))
+        self.assertIsNone(cursor)
+
+    def test_owners_are_isolated(self):
+        rows, _ = self.bot.history_page("bob", limit=100)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(self.bot.history_page("nobody"), ([], None))
+
+    def test_concurrent_pages_never_see_another_owners_rows(self):
+        self.bot.conn.close()
+        self.bot.conn = sqlite3.connect(self.bot.DB_PATH, check_same_thread=False)
+        self.bot.cursor = self.bot.conn.cursor()
+        owner_of = dict(self.bot.conn.execute("SELECT id, owner FROM chat_history"))
+
+        def owners_seen(owner):
+            seen = set()
+            for _ in range(300):
+                rows, _ = self.bot.history_page(owner, limit=5)
+                seen.update(owner_of[row[0]] for row in rows)
+            return owner, seen
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for owner, seen in pool.map(owners_seen, ["alice", "bob"] * 4):
+                self.assertEqual(seen, {owner})
+
+    def test_iter_history_batches_cover_everything_in_order(self):
+        ids = [row[0] for row in self.bot.iter_history(batch_size=4)]
+        self.assertEqual(ids, list(range(1, 31)))
+        self.assertEqual([row[0] for row in self.bot.iter_history("alice", batch_size=4)], self.alice_ids[::-1])
+
+
+class ConversationMemoryTests(TempDirMixin, SimpleTestCase):
+    def engine(self, shared_memory):
+        bot = ChatbotEngine.__new__(ChatbotEngine)
+        bot.DB_PATH = os.path.join(self.tmp, "chat.db")
+        bot.conn = make_chat_db(bot.DB_PATH, 0)
+        bot.cursor = bot.conn.cursor()
+        bot.shared_memory = shared_memory
+        bot.write_lock = SQLiteWriteLock(bot.DB_PATH)
+        bot.initialize_memory()
+        return bot
+
+    def history_lengths(self, bot, owner, turns):
+        lengths = []
+        for turn in range(turns):
+            bot._store_conversation(f"q{turn}", f"a{turn}", owner)
+            lengths.append(len(bot.memory_for(owner).load_memory_variables({})["chat_history"]))
+        return lengths
+
+    def assert_trimmed_in_steps(self, shared_memory):
+        bot = self.engine(shared_memory)
+        keep = 2 * bot.MEMORY_TURNS
+        lengths = self.history_lengths(bot, "alice", 3 * bot.MEMORY_TURNS)
+        # Grows by one turn at a time up to twice the window, then drops back to the window
+        self.assertEqual(lengths[:2 * bot.MEMORY_TURNS - 1], list(range(2, 2 * keep, 2)))
+        self.assertEqual(lengths[2 * bot.MEMORY_TURNS - 1], keep)
+        self.assertEqual(max(lengths), 2 * keep - 2)
+        messages = bot.memory_for("alice").load_memory_variables({})["chat_history"]
+        self.assertEqual(messages[-1].content, f"a{3 * bot.MEMORY_TURNS - 1}")
+        self.assertEqual(bot.memory_for("bob").load_memory_variables({})["chat_history"], [])
+
+    def test_in_process_history_is_append_only_between_trims(self):
+        self.assert_trimmed_in_steps(shared_memory=False)
+
+    def test_shared_history_is_append_only_between_trims(self):
+        self.assert_trimmed_in_steps(shared_memory=True)
+
+
+class ImagePipelineTests(TempDirMixin, SimpleTestCase):
+    def save(self, img, name):
+        path = os.path.join(self.tmp, name)
+        img.save(path)
+        return path
+
+    def test_jpeg_decoded_at_reduced_scale_then_thumbnailed(self):
+        path = self.save(Image.new("RGB", (2000, 1000), "white"), "page.jpg")
+        img, stats = load_for_ocr(path, max_side=400)
+        # draft() picks the smallest JPEG scale (1/4 here) still at least the requested size
+        self.assertEqual(stats["original_size"], (2000, 1000))
+        self.assertEqual(stats["decoded_bytes"], 500 * 250)
+        self.assertEqual(img.size, (400, 200))
+
+    def test_png_decoded_in_full_then_thumbnailed(self):
+        path = self.save(Image.new("RGB", (1000, 600), "white"), "page.png")
+        img, stats = load_for_ocr(path, max_side=400)
+        self.assertEqual(stats["decoded_bytes"], 1000 * 600 * 4)
+        self.assertEqual(img.size, (400, 240))
+
+    def test_pixel_guard_rejects_before_decoding(self):
+        path = self.save(Image.new("L", (300, 300)), "big.png")
+        with self.assertRaises(ImageTooLargeError):
+            load_for_ocr(path, max_pixels=300 * 299)
+
+    def test_preprocess_binarises_without_resizing(self):
+        img = Image.new("RGB", (120, 80), "white")
+        ImageDraw.Draw(img).rectangle((10, 10, 60, 30), fill="black")
+        result = preprocess(img)
+        self.assertEqual((result.mode, result.size), ("1", (120, 80)))
+        self.assertEqual(result.getpixel((30, 20)), 0)
+        self.assertEqual(result.getpixel((100, 70)), 255)
+
+    def lined_page(self, lines, line_height=20, gap=10, width=100):
+        page = Image.new("1", (width, lines * (line_height + gap)), 1)
+        draw = ImageDraw.Draw(page)
+        for i in range(lines):
+            top = i * (line_height + gap)
+            draw.rectangle((0, top, width - 1, top + line_height - 1), fill=0)
+        return page
+
+    def test_strips_cut_at_blank_rows_without_overlap(self):
+        page = self.lined_page(40)
+        boxes = _tile_boxes(page, tile_pixels=100 * 250, search_rows=30)
+        self.assertGreater(len(boxes), 1)
+        self.assertEqual(boxes[0][1], 0)
+        self.assertEqual(boxes[-1][3], page.height)
+        for (_, _, _, bottom), (_, top, _, _) in zip(boxes, boxes[1:]):
+            self.assertEqual(bottom, top)
+            # Every cut is on a gap row, so no line is split or read by two strips
+            self.assertGreaterEqual(bottom % 30, 20)
+
+    def test_page_without_blank_rows_split_at_nominal_height(self):
+        page = Image.new("1", (100, 1000), 0)
+        boxes = _tile_boxes(page, tile_pixels=100 * 300, search_rows=30)
+        self.assertEqual(boxes, [(0, 0, 100, 300), (0, 300, 100, 600), (0, 600, 100, 900), (0, 900, 100, 1000)])
+
+
+class StubSpeechEngine:
+    """Stands in for pyttsx3: writes the text itself as the audio file"""
+
+    def __init__(self):
+        self.voices = [SimpleNamespace(id="voice-0"), SimpleNamespace(id="voice-1")]
+        self.rendered = []
+        self._job = None
+
+    def getProperty(self, name):
+        return self.voices
+
+    def setProperty(self, name, value):
+        pass
+
+    def save_to_file(self, text, path):
+        self._job = (text, path)
+
+    def runAndWait(self):
+        text, path = self._job
+        with open(path, "w") as f:
+            f.write(text)
+        self.rendered.append(text)
+
+
+def import_views():
+    """chatbot.views builds the engine when imported; a mock stands in so no model is loaded"""
+    with mock.patch("chatbot.logic.chatbot_engine.ChatbotEngine"), \
+            override_settings(CHATBOT_WARM_MODELS=False, CHATBOT_RETENTION_INTERVAL=None):
+        from . import views
+    return views
+
+
+class SpeechRendererTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = StubSpeechEngine()
+        with mock.patch("chatbot.logic.tts_service.pyttsx3.init", return_value=self.engine):
+            self.renderer = SpeechRenderer(self.tmp, max_cache_bytes=100)
+        self.addCleanup(self.renderer.shutdown)
+
+    def test_cache_key_covers_text_voice_rate_and_pinning(self):
+        key = self.renderer.cache_filename
+        self.assertEqual(key("hi"), key("hi", voice=0, rate=self.renderer.default_rate))
+        self.assertEqual(len({key("hi"), key("ho"), key("hi", voice=1), key("hi", rate=200),
+                              key("hi", pinned=True)}), 5)
+        self.assertTrue(key("hi", pinned=True).startswith(SpeechRenderer.PINNED_PREFIX))
+
+    def test_cache_hit_skips_synthesis(self):
+        filename, cached = self.renderer.render("hello", voice=1)
+        self.assertFalse(cached)
+        self.assertEqual(self.renderer.render("hello", voice=1), (filename, True))
+        self.assertEqual(self.engine.rendered, ["hello"])
+
+    def write_entry(self, name, size, age):
+        path = os.path.join(self.tmp, name + SpeechRenderer.AUDIO_EXT)
+        with open(path, "w") as f:
+            f.write("x" * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_eviction_is_least_recently_used_and_spares_pinned_entries(self):
+        pinned = self.write_entry(SpeechRenderer.PINNED_PREFIX + "greeting", 60, age=300)
+        oldest = self.write_entry("oldest", 30, age=200)
+        recent = self.write_entry("recent", 30, age=100)
+        self.renderer._evict()
+        self.assertTrue(os.path.exists(pinned))
+        self.assertFalse(os.path.exists(oldest))
+        self.assertTrue(os.path.exists(recent))
+
+    def test_overlong_text_and_unknown_voice_rejected(self):
+        with self.assertRaises(ValueError):
+            self.renderer.render("x" * (SpeechRenderer.MAX_TEXT_CHARS + 1))
+        with self.assertRaises(ValueError):
+            self.renderer.render("hello", voice=2)
+        self.assertEqual(self.engine.rendered, [])
+
+    def test_view_answers_bad_requests_with_400(self):
+        views = import_views()
+        factory = APIRequestFactory()
+        with mock.patch.object(views, "bot") as bot:
+            bot.speak = self.renderer.render
+            for payload in ({"text": "x" * (SpeechRenderer.MAX_TEXT_CHARS + 1)},
+                            {"text": "hello", "voice": 5},
+                            {"text": "hello", "voice": "loud"}):
+                response = views.tts_view(factory.post("/api/tts/", payload, format="json"))
+                self.assertEqual(response.status_code, 400, payload)
+            response = views.tts_view(factory.post("/api/tts/", {"text": "hello", "voice": 1}, format="json"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["audio_url"].startswith("/media/tts_cache/"))
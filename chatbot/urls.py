@@ -7,5 +7,10 @@ urlpatterns = [
     path("", home, name="home"),
     path("api/upload/", DocumentUploadView.as_view(), name="upload_api"),
     path("chat/", views.chat_view, name="chat"),  # URL for chat view
+    path("api/tts/", views.tts_view, name="tts_api"),
+    path("api/history/", views.history_view, name="history_api"),
+    path("api/history/export/", views.history_export, name="history_export"),
+    path("api/routing-stats/", views.routing_stats, name="routing_stats"),
+    path("api/embedding-stats/", views.embedding_stats, name="embedding_stats"),
 
 ]
\ No newline at end of file
@@ -1,13 +1,20 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser
 from rest_framework.decorators import api_view
 from .logic.chatbot_engine import ChatbotEngine
+from .logic.retention import RetentionManager, RetentionPolicy
+from .logic.model_warmer import ModelWarmer
 from django.conf import settings
 import os
+import csv
+import json
+import time
+import queue
 import logging
+import threading
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -16,7 +23,94 @@ logger = logging.getLogger(__name__)
 os.makedirs(os.path.join(settings.BASE_DIR, 'media'), exist_ok=True)
 
 # Initialize the chatbot engine
-bot = ChatbotEngine()
+bot = ChatbotEngine(
+    partitioned_owners=getattr(settings, "CHATBOT_PARTITIONED_OWNERS", ()),
+    shared_memory=getattr(settings, "CHATBOT_SHARED_MEMORY", False),
+    chroma_host=getattr(settings, "CHATBOT_CHROMA_HOST", None),
+    chroma_port=getattr(settings, "CHATBOT_CHROMA_PORT", 8000),
+    embedding_url=getattr(settings, "CHATBOT_EMBEDDING_URL", None),
+    embed_batch_size=getattr(settings, "CHATBOT_EMBED_BATCH_SIZE", 32),
+    embed_max_wait_ms=getattr(settings, "CHATBOT_EMBED_MAX_WAIT_MS", 5),
+    fast_model=getattr(settings, "CHATBOT_FAST_MODEL", None),
+    reasoning_model=getattr(settings, "CHATBOT_REASONING_MODEL", None),
+    max_simple_words=getattr(settings, "CHATBOT_MAX_SIMPLE_WORDS", ChatbotEngine.MAX_SIMPLE_WORDS)
+)
+
+# Periodically prune, archive and compact the chatbot's stores
+retention = RetentionManager(
+    db_path=bot.DB_PATH,
+    chroma_path=bot.CHROMA_PATH,
+    archive_dir=getattr(settings, "CHATBOT_ARCHIVE_DIR", os.path.join(settings.BASE_DIR, 'archive')),
+    policy=RetentionPolicy.from_dict(getattr(settings, "CHATBOT_RETENTION", None)),
+    chroma_client=bot.chroma_client,
+    write_lock=bot.write_lock,
+    owns_chroma=not bot.chroma_host
+)
+if getattr(settings, "CHATBOT_RETENTION_INTERVAL", None):
+    retention.start(settings.CHATBOT_RETENTION_INTERVAL)
+
+# Keep the LLMs loaded during business hours so the first chat after idle skips the model load
+if getattr(settings, "CHATBOT_WARM_MODELS", False):
+    ModelWarmer(
+        models=list(dict.fromkeys([bot.fast_model, bot.reasoning_model])),
+        keep_alive=bot.KEEP_ALIVE,
+        interval_seconds=getattr(settings, "CHATBOT_WARM_INTERVAL", 240),
+        business_hours=getattr(settings, "CHATBOT_BUSINESS_HOURS", (8, 20))
+    ).start()
+
+
+class StageTimer:
+    """Records how long each stage of a request took, reported in a Server-Timing header"""
+
+    def __init__(self):
+        self.stages = []
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def apply(self, response):
+        if self.stages:
+            response["Server-Timing"] = ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages)
+        return response
+
+
+def get_owner(request):
+    """Identify whose documents a request may read and write"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    # Anonymous visitors are scoped to their session
+    if not request.session.session_key:
+        request.session.save()
+    return f"session:{request.session.session_key}"
+
+def save_history(question, response, owner):
+    # Records the turn in chat_history and in the owner's conversation memory for the next prompt
+    bot._store_conversation(question, response, owner)
+    logger.debug("Chat history updated")
+
+
+def stream_analysis(question, text, owner, workspace=None):
+    """Run a document analysis, yielding NDJSON progress events and then the response"""
+    events = queue.Queue()
+
+    def progress(stage, done, total):
+        events.put({"type": "progress", "stage": stage, "done": done, "total": total})
+
+    def run():
+        response = bot.analyze_document(text, progress, owner, workspace)
+        save_history(question, response, owner)
+        events.put({"type": "response", "response": response})
+
+    threading.Thread(target=run, daemon=True).start()
+    while True:
+        event = events.get()
+        yield json.dumps(event) + "\n"
+        if event["type"] == "response":
+            break
+
 
 def home(request):
     return render(request, 'base.html')
@@ -25,7 +119,11 @@ def chat_view(request):
     if request.method == "POST":
         question = request.POST.get("question", "").strip()
         document = request.FILES.get("document")
+        owner = get_owner(request)
+        workspace = request.POST.get("workspace") or None
+        timer = StageTimer()
         response = ""
+        analysis_text = None
 
         if document:
             file_path = os.path.join(settings.BASE_DIR, 'media', document.name)
@@ -35,6 +133,7 @@ def chat_view(request):
                 with open(file_path, 'wb+') as destination:
                     for chunk in document.chunks():
                         destination.write(chunk)
+                timer.mark("save")
 
                 logger.info(f"File uploaded: {document.name} by {'anonymous' if not request.user.is_authenticated else request.user.username}")
 
@@ -42,12 +141,21 @@ def chat_view(request):
                 content_type = document.content_type.lower()
                 if (document.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')) or content_type.startswith('image/')):
                     logger.info("Processing as image")
-                    response = bot.process_image(file_path)
+                    response = bot.process_image(file_path, owner, workspace)
+                    timer.mark("ingest")
                 else:
                     logger.info("Processing as document")
-                    document_content = bot.process_document(file_path)
-                    enhanced_question = f"{question}\n\nDocument content:\n{document_content}" if question else f"Please analyze this document:\n{document_content}"
-                    response = bot.general_query(enhanced_question)
+                    text, document_content = bot.ingest_document(file_path, owner, workspace)
+                    timer.mark("ingest")
+                    if question:
+                        enhanced_question = f"{question}\n\nDocument content:\n{document_content}"
+                        response = bot.general_query(enhanced_question, owner, workspace)
+                        timer.mark("query")
+                    elif text:
+                        # No question: analyze the whole document once the upload is cleaned up
+                        analysis_text = text
+                    else:
+                        response = document_content
 
             except Exception as e:
                 logger.error(f"Error processing file {document.name}: {str(e)}", exc_info=True)
@@ -63,21 +171,26 @@ def chat_view(request):
 
         elif question:
             logger.info(f"Processing text query: {question[:100]}...")
-            response = bot.general_query(question)
+            response = bot.general_query(question, owner, workspace)
+            timer.mark("query")
+
+        if analysis_text:
+            if "application/x-ndjson" in request.headers.get("Accept", ""):
+                return timer.apply(StreamingHttpResponse(
+                    stream_analysis(question, analysis_text, owner, workspace), content_type="application/x-ndjson"
+                ))
+            response = bot.analyze_document(analysis_text, owner=owner, workspace=workspace)
+            timer.mark("analysis")
 
         # Save chat history
         if question or document:
-            try:
-                bot.cursor.execute("INSERT INTO chat_history (user_query, bot_response) VALUES (?, ?)", (question, response))
-                bot.conn.commit()
-                logger.debug("Chat history updated")
-            except Exception as e:
-                logger.error(f"Error saving chat history: {str(e)}")
+            save_history(question, response, owner)
+            timer.mark("history")
 
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({"response": response})
+            return timer.apply(JsonResponse({"response": response}))
 
-        return render(request, 'base.html', {"response": response})
+        return timer.apply(render(request, 'base.html', {"response": response}))
 
     return render(request, 'base.html')
 
@@ -92,21 +205,26 @@ class DocumentUploadView(APIView):
             return Response({"error": "No file provided"}, status=400)
 
         file_path = os.path.join(settings.BASE_DIR, 'media', file.name)
+        timer = StageTimer()
 
         try:
             with open(file_path, 'wb+') as destination:
                 for chunk in file.chunks():
                     destination.write(chunk)
+            timer.mark("save")
 
             logger.info(f"API file upload: {file.name} by {'anonymous' if not request.user.is_authenticated else request.user.username}")
 
+            owner = get_owner(request)
+            workspace = request.data.get("workspace") or None
             content_type = file.content_type.lower()
             if (file.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')) or content_type.startswith('image/')):
-                result = bot.process_image(file_path)
+                result = bot.process_image(file_path, owner, workspace)
             else:
-                result = bot.process_document(file_path)
+                result = bot.process_document(file_path, owner, workspace)
+            timer.mark("ingest")
 
-            return Response({"result": result})
+            return timer.apply(Response({"result": result}))
 
         except Exception as e:
             logger.error(f"API error processing file {file.name}: {str(e)}", exc_info=True)
@@ -121,6 +239,105 @@ class DocumentUploadView(APIView):
                     logger.error(f"Error removing API temp file: {str(e)}")
 
 
+@api_view(['POST'])
+def tts_view(request):
+    """Render a bot response to audio and return a URL to the cached file"""
+    text = request.data.get("text", "").strip()
+    if not text:
+        return Response({"error": "No text provided"}, status=400)
+
+    try:
+        voice = int(request.data.get("voice", bot.current_voice))
+        rate = int(request.data["rate"]) if request.data.get("rate") else None
+        filename, cached = bot.speak(text, voice=voice, rate=rate)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"TTS rendering failed: {str(e)}", exc_info=True)
+        return Response({"error": str(e)}, status=503)
+
+    # Cache hits are served straight from MEDIA_ROOT as static files: by Django only under DEBUG,
+    # otherwise by the front-end web server (see chatbot_project/urls.py)
+    return Response({
+        "audio_url": f"{settings.MEDIA_URL}tts_cache/{filename}",
+        "cached": cached
+    })
+
+
+def history_owner(request):
+    """Staff may browse any owner's history (or all of it); everyone else sees their own"""
+    if request.user.is_authenticated and request.user.is_staff and "owner" in request.GET:
+        return request.GET["owner"] or None
+    return get_owner(request)
+
+
+@api_view(['GET'])
+def history_view(request):
+    """Chat history newest first; pass the returned next_cursor as ?before= for the next page"""
+    try:
+        limit = min(max(int(request.GET.get("limit", 50)), 1), 200)
+        before = int(request.GET["before"]) if request.GET.get("before") else None
+    except ValueError:
+        return Response({"error": "limit and before must be integers"}, status=400)
+
+    owner = history_owner(request)
+    if owner is None:
+        return Response({"error": "owner is required"}, status=400)
+    rows, next_cursor = bot.history_page(owner, before=before, limit=limit)
+    return Response({
+        "results": [
+            {"id": row[0], "user_query": row[1], "bot_response": row[2], "timestamp": row[3]}
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    })
+
+
+class Echo:
+    """File-like object whose write() just returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def history_export(request):
+    """Stream chat history as NDJSON or CSV in constant memory"""
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in ("ndjson", "csv"):
+        return JsonResponse({"error": "format must be ndjson or csv"}, status=400)
+
+    rows = bot.iter_history(history_owner(request))
+    columns = ("id", "owner", "user_query", "bot_response", "timestamp")
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+
+        def csv_lines():
+            yield writer.writerow(columns)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(csv_lines(), content_type="text/csv")
+    else:
+        response = StreamingHttpResponse(
+            (json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows),
+            content_type="application/x-ndjson"
+        )
+    response["Content-Disposition"] = f'attachment; filename="chat_history.{export_format}"'
+    return response
+
+
+@api_view(['GET'])
+def routing_stats(request):
+    """Per-model routing decisions and latency, for tuning the cascade thresholds"""
+    return Response(bot.router.stats())
+
+
+@api_view(['GET'])
+def embedding_stats(request):
+    """Batch fill ratio and queueing delay of the embedding micro-batcher"""
+    return Response(bot.embedding_model.stats())
+
+
 @api_view(['POST'])
 def debug_upload(request):
     """Endpoint for testing file uploads"""
@@ -113,3 +113,43 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = 'chatbot.CustomUser'
+
+# Document owners (e.g. "user:42") large enough to warrant their own Chroma collection
+CHATBOT_PARTITIONED_OWNERS = []
+
+# Multi-worker mode (see gunicorn.conf.py): conversation memory in SQLite, one Chroma server
+# ("chroma run --path ./chroma_db") and one embedding service ("manage.py embedding_server")
+CHATBOT_SHARED_MEMORY = False
+CHATBOT_CHROMA_HOST = None
+CHATBOT_CHROMA_PORT = 8000
+CHATBOT_EMBEDDING_URL = None  # e.g. "http://127.0.0.1:8765"
+
+# Query embeddings from concurrent requests are batched: up to this many per ONNX call,
+# waiting at most this long for the batch to fill
+CHATBOT_EMBED_BATCH_SIZE = 32
+CHATBOT_EMBED_MAX_WAIT_MS = 5
+
+# Ollama models: short simple questions go to the fast model, everything else (and any
+# simple question the fast model fails on) to the reasoning model. Set both to the same
+# model on installs that only have one.
+CHATBOT_FAST_MODEL = "llama3.2:3b"
+CHATBOT_REASONING_MODEL = "deepseek-r1:latest"
+CHATBOT_MAX_SIMPLE_WORDS = 25
+
+# Ping the Ollama models every CHATBOT_WARM_INTERVAL seconds between these local hours
+# (Mon-Fri) so they stay loaded; must be shorter than ChatbotEngine.KEEP_ALIVE
+CHATBOT_WARM_MODELS = True
+CHATBOT_WARM_INTERVAL = 240
+CHATBOT_BUSINESS_HOURS = (8, 20)
+
+# Retention for chatbot_memory.db and chroma_db; see chatbot.logic.retention.RetentionPolicy
+CHATBOT_RETENTION = {
+    "chat_history_days": 90,
+    "chat_history_max_rows": 100_000,
+    "documents_days": None,
+    "summaries_days": 30,
+    "archive": True,
+}
+CHATBOT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive')
+# Seconds between background retention runs; None disables the scheduler
+CHATBOT_RETENTION_INTERVAL = 24 * 60 * 60
@@ -9,4 +9,7 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path('',include('chatbot.urls')),
 
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# static() only adds this route when DEBUG is on. In production the web server in front of
+# gunicorn must serve MEDIA_ROOT at MEDIA_URL itself, or the TTS audio_url links 404, e.g. nginx:
+#     location /media/tts_cache/ { alias /srv/chatbot/media/tts_cache/; }
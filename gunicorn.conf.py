@@ -0,0 +1,27 @@
+# Multi-worker deployment:
+#   chroma run --path ./chroma_db --port 8000
+#   python manage.py embedding_server
+#   gunicorn -c gunicorn.conf.py chatbot_project.wsgi
+# with CHATBOT_SHARED_MEMORY, CHATBOT_CHROMA_HOST and CHATBOT_EMBEDDING_URL set in settings.py.
+# Gunicorn runs without DEBUG, so /media/ (TTS audio) must be served by the web server in front
+# of it; see chatbot_project/urls.py.
+import os
+
+bind = os.environ.get("CHATBOT_BIND", "127.0.0.1:8001")
+workers = int(os.environ.get("CHATBOT_WORKERS", 4))
+threads = int(os.environ.get("CHATBOT_THREADS", 4))
+timeout = 300
+
+# Import Django, LangChain and the engine once in the master so workers share those pages
+# copy-on-write. The retention scheduler therefore runs once, in the master only.
+preload_app = True
+
+
+def when_ready(server):
+    # Django resolves URLconfs lazily; import the views now so the engine is built before forking
+    from chatbot import views  # noqa: F401
+
+
+def post_fork(server, worker):
+    from chatbot import views
+    views.bot.reinitialize_after_fork()
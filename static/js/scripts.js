@@ -75,13 +75,8 @@ if (isSpeechSupported) {
     voiceInputBtn.style.display = 'none';
 }
 
-// Initialize text-to-speech if supported
-if (!isSynthesisSupported) {
-    speakerBtn.style.display = 'none';
-    document.querySelectorAll('.message-speaker').forEach(btn => {
-        btn.style.display = 'none';
-    });
-}
+// Audio element used when speech is rendered on the server
+let serverAudio = null;
 
 // Show error message
 function showError(message) {
@@ -218,11 +213,6 @@ voiceInputBtn.addEventListener('click', function() {
 
 // Handle speaker buttons
 speakerBtn.addEventListener('click', function() {
-    if (!isSynthesisSupported) {
-        showError('Text-to-speech not supported in your browser');
-        return;
-    }
-    
     const messages = document.querySelectorAll('.message-content p');
     if (messages.length === 0) return;
     
@@ -244,6 +234,11 @@ document.addEventListener('click', function(e) {
 
 // Function to speak a message
 function speakMessage(message) {
+    if (!isSynthesisSupported) {
+        speakMessageFromServer(message);
+        return;
+    }
+
     if (speechSynthesis.speaking) {
         speechSynthesis.cancel();
     }
@@ -256,6 +251,37 @@ function speakMessage(message) {
     speechSynthesis.speak(utterance);
 }
 
+// Fall back to audio rendered by the server when the browser has no speech synthesis
+async function speakMessageFromServer(message) {
+    const formData = new FormData();
+    formData.append('text', message);
+
+    try {
+        const response = await fetch('/api/tts/', {
+            method: 'POST',
+            body: formData,
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken'),
+            },
+            credentials: 'include'
+        });
+
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || 'Text-to-speech request failed');
+        }
+
+        if (serverAudio) {
+            serverAudio.pause();
+        }
+        serverAudio = new Audio(data.audio_url);
+        serverAudio.play();
+    } catch (error) {
+        console.error('Text-to-speech error:', error);
+        showError(error.message || 'Text-to-speech is unavailable');
+    }
+}
+
 // Handle form submission
 chatForm.addEventListener('submit', async function(e) {
     e.preventDefault();
@@ -345,6 +371,8 @@ chatForm.addEventListener('submit', async function(e) {
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
                 'X-CSRFToken': getCookie('csrftoken'),
+                // Document analysis streams its progress as newline-delimited JSON
+                'Accept': 'application/x-ndjson, application/json',
             },
             credentials: 'include'
         });
@@ -354,7 +382,8 @@ chatForm.addEventListener('submit', async function(e) {
             throw new Error(errorData.error || 'Request failed');
         }
 
-        const data = await response.json();
+        const isStream = (response.headers.get('Content-Type') || '').includes('application/x-ndjson');
+        const data = isStream ? await readAnalysisStream(response, typingIndicator) : await response.json();
         
         // Remove typing indicator
         const typingIndicators = document.querySelectorAll('.typing-indicator');
@@ -414,6 +443,39 @@ chatForm.addEventListener('submit', async function(e) {
     }
 });
 
+// Read NDJSON analysis events, showing progress in the typing indicator until the response arrives
+async function readAnalysisStream(response, indicator) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const stages = { summarizing: 'Reading sections', combining: 'Combining notes', writing: 'Writing analysis' };
+    let buffer = '';
+    let progressLabel = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.type === 'response') {
+                return event;
+            }
+            if (!progressLabel) {
+                progressLabel = document.createElement('p');
+                progressLabel.className = 'analysis-progress';
+                indicator.querySelector('.message-content').appendChild(progressLabel);
+            }
+            progressLabel.textContent = `${stages[event.stage] || event.stage}: ${event.done}/${event.total}`;
+            chatContainer.scrollTop = chatContainer.scrollHeight;
+        }
+    }
+    throw new Error('Analysis ended without a response');
+}
+
 // Update chat history in sidebar
 function updateChatHistory(query, response) {
     const historyContainer = document.getElementById('history-container');